@@ -0,0 +1,182 @@
+"""
+Generates realistic CustomerData and credit_card_transactions rows at scale.
+
+Rows are produced lazily, so millions of them can be written without holding them in
+memory. The output is deterministic for a given --seed.
+
+    * card numbers are Luhn-valid and use the issuer prefix of their card type
+    * about --blocked-rate of the cards are blocked; --auth-blocked-share of those
+      have a burst of 4-6 failed authentications in the last week, the rest are
+      blocked for other reasons
+    * other transactions fail authentication with --failure-rate probability
+    * amounts follow a log-normal distribution, dates are spread over --days days
+
+USAGE:
+    python resources/setup/generate_data.py --customers 100000 --transactions 5000000 --out-dir data/
+
+Load the CSV files into the schema of setup_db_partitioned.sql with load_data.py, or let
+load_data.py --generate stream the rows without writing files at all.
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+import time
+
+CARD_TYPES = [
+    # (card type, share, issuer prefixes, card number length)
+    ("Visa", 0.5, ["4"], 16),
+    ("MasterCard", 0.3, ["51", "52", "53", "54", "55"], 16),
+    ("American Express", 0.12, ["34", "37"], 15),
+    ("Discover", 0.08, ["6011"], 16),
+]
+
+LOCATIONS = [
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio",
+    "San Diego", "Dallas", "San Jose", "Austin", "Seattle", "San Francisco", "Denver", "Boston",
+]
+
+# Generated customer ids start above the demo customers setup_db_partitioned.sql inserts
+# (3, 4, 123456 and 136743), so both can be loaded into the same table
+FIRST_CUSTOMER_ID = 1_000_000
+
+CUSTOMER_COLUMNS = ["customer_id", "card_blocked", "payment_due", "card_type", "credit_card_no"]
+TRANSACTION_COLUMNS = ["credit_card_no", "date", "amount", "authentication_passed", "location"]
+
+
+def _luhn_complete(partial: str) -> str:
+    """Appends the Luhn check digit to ``partial``."""
+    total = 0
+    for index, digit in enumerate(reversed(partial)):
+        value = int(digit)
+        if index % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return partial + str((10 - total % 10) % 10)
+
+
+def _card_number(rng: random.Random, prefixes: list, length: int) -> int:
+    prefix = rng.choice(prefixes)
+    body = "".join(rng.choices("0123456789", k=length - len(prefix) - 1))
+    return int(_luhn_complete(prefix + body))
+
+
+def iter_customers(
+    count: int, seed: int = 42, blocked_rate: float = 0.05, payment_due_rate: float = 0.2, first_id: int = FIRST_CUSTOMER_ID
+):
+    """
+    Yields CustomerData rows as tuples in CUSTOMER_COLUMNS order. Every customer has one
+    card and customer ids are consecutive from ``first_id``.
+    """
+    rng = random.Random(seed)
+    weights = [share for _, share, _, _ in CARD_TYPES]
+    for offset in range(count):
+        card_type, _, prefixes, length = rng.choices(CARD_TYPES, weights=weights)[0]
+        yield (
+            first_id + offset,
+            rng.random() < blocked_rate,
+            rng.random() < payment_due_rate,
+            card_type,
+            _card_number(rng, prefixes, length),
+        )
+
+
+def iter_transactions(
+    customers,
+    count: int,
+    seed: int = 42,
+    days: int = 365,
+    failure_rate: float = 0.02,
+    auth_blocked_share: float = 0.6,
+    end: datetime.datetime | None = None,
+):
+    """
+    Yields credit_card_transactions rows as tuples in TRANSACTION_COLUMNS order for the
+    cards of ``customers`` (rows from :func:`iter_customers`). About ``count`` rows are
+    produced: the regular traffic plus the failure bursts of cards blocked for failed
+    authentications.
+    """
+    rng = random.Random(seed + 1)
+    end = end or datetime.datetime.now().replace(microsecond=0)
+    span = days * 86400
+    cards = []
+    for customer_id, card_blocked, _, _, credit_card_no in customers:
+        cards.append(credit_card_no)
+        if card_blocked and rng.random() < auth_blocked_share:
+            # A burst of failed authentications in the last week explains the block
+            for _ in range(rng.randint(4, 6)):
+                yield (
+                    credit_card_no,
+                    end - datetime.timedelta(seconds=rng.randrange(7 * 86400)),
+                    round(rng.lognormvariate(4, 1), 2),
+                    False,
+                    rng.choice(LOCATIONS),
+                )
+    if not cards:
+        return
+    for _ in range(count):
+        yield (
+            cards[rng.randrange(len(cards))],
+            end - datetime.timedelta(seconds=rng.randrange(span)),
+            min(round(rng.lognormvariate(4, 1), 2), 99999999.99),
+            rng.random() >= failure_rate,
+            rng.choice(LOCATIONS),
+        )
+
+
+def write_csv(path: str, columns: list, rows) -> int:
+    """Writes ``rows`` with a header to ``path`` and returns the number of rows written."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=5000000)
+    parser.add_argument("--days", type=int, default=365, help="spread transactions over this many days")
+    parser.add_argument("--blocked-rate", type=float, default=0.05)
+    parser.add_argument("--auth-blocked-share", type=float, default=0.6)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--first-id", type=int, default=FIRST_CUSTOMER_ID, help="customer id of the first generated row")
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    started = time.perf_counter()
+    customers_path = os.path.join(args.out_dir, "customerdata.csv")
+    transactions_path = os.path.join(args.out_dir, "credit_card_transactions.csv")
+
+    customers = write_csv(
+        customers_path, CUSTOMER_COLUMNS, iter_customers(args.customers, args.seed, args.blocked_rate, first_id=args.first_id)
+    )
+    transactions = write_csv(
+        transactions_path,
+        TRANSACTION_COLUMNS,
+        iter_transactions(
+            iter_customers(args.customers, args.seed, args.blocked_rate, first_id=args.first_id),
+            args.transactions,
+            seed=args.seed,
+            days=args.days,
+            failure_rate=args.failure_rate,
+            auth_blocked_share=args.auth_blocked_share,
+        ),
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {customers} customers to {customers_path}")
+    print(f"Wrote {transactions} transactions to {transactions_path}")
+    print(f"{(customers + transactions) / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Bulk loads CustomerData and credit_card_transactions with COPY FROM STDIN.
+
+Rows come either from CSV files (as written by generate_data.py) or straight from the
+generator, and are streamed to PostgreSQL in batches of --batch-size rows, one COPY and
+one commit per batch. The columns already have their final types (see
+setup_db_partitioned.sql), so nothing is rewritten after the load. Throughput is printed
+per batch and per table.
+
+USAGE:
+    python resources/setup/load_data.py --create-schema --generate --customers 1000000 --transactions 50000000
+    python resources/setup/load_data.py --customers-csv data/customerdata.csv --transactions-csv data/credit_card_transactions.csv
+
+The DB_* variables from .env select the database.
+"""
+import argparse
+import csv
+import io
+import itertools
+import os
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+from generate_data import CUSTOMER_COLUMNS, FIRST_CUSTOMER_ID, TRANSACTION_COLUMNS, iter_customers, iter_transactions
+
+load_dotenv()
+
+SETUP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _csv_batches(rows, batch_size: int):
+    """Groups ``rows`` (tuples) into CSV encoded buffers of ``batch_size`` rows."""
+    rows = iter(rows)
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for row in itertools.islice(rows, batch_size):
+            writer.writerow(row)
+            count += 1
+        if not count:
+            return
+        buffer.seek(0)
+        yield buffer, count
+
+
+def _file_batches(path: str, batch_size: int):
+    """Groups the lines of a CSV file, without its header, into buffers of ``batch_size`` rows."""
+    with open(path, encoding="utf-8", newline="") as file:
+        file.readline()
+        while True:
+            lines = list(itertools.islice(file, batch_size))
+            if not lines:
+                return
+            yield io.StringIO("".join(lines)), len(lines)
+
+
+def copy_batches(connection, table: str, columns: list, batches) -> int:
+    """COPYs every batch into ``table`` and returns the number of rows loaded."""
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        for buffer, count in batches:
+            batch_started = time.perf_counter()
+            cursor.copy_expert(statement, buffer)
+            connection.commit()
+            total += count
+            now = time.perf_counter()
+            print(
+                f"{table}: {total:,} rows, batch {count / (now - batch_started):,.0f} rows/s, "
+                f"overall {total / (now - started):,.0f} rows/s",
+                flush=True,
+            )
+    elapsed = time.perf_counter() - started
+    print(f"{table}: loaded {total:,} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--create-schema", action="store_true", help="run setup_db_partitioned.sql first")
+    parser.add_argument("--truncate", action="store_true", help="empty both tables before loading")
+    parser.add_argument("--customers-csv", help="CSV file with the CustomerData rows")
+    parser.add_argument("--transactions-csv", help="CSV file with the credit_card_transactions rows")
+    parser.add_argument("--generate", action="store_true", help="stream rows from generate_data.py instead of CSV files")
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=5000000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--first-id", type=int, default=FIRST_CUSTOMER_ID, help="customer id of the first generated row, above the demo customers"
+    )
+    parser.add_argument("--batch-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    if not args.generate and not (args.customers_csv or args.transactions_csv):
+        parser.error("pass --generate or at least one of --customers-csv / --transactions-csv")
+
+    connection = psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+    try:
+        with connection.cursor() as cursor:
+            if args.create_schema:
+                with open(os.path.join(SETUP_DIR, "setup_db_partitioned.sql"), encoding="utf-8") as file:
+                    cursor.execute(file.read())
+            if args.truncate:
+                cursor.execute("TRUNCATE customerdata, credit_card_transactions")
+        connection.commit()
+
+        started = time.perf_counter()
+        loaded = 0
+        if args.generate:
+            loaded += copy_batches(
+                connection,
+                "customerdata",
+                CUSTOMER_COLUMNS,
+                _csv_batches(iter_customers(args.customers, args.seed, first_id=args.first_id), args.batch_size),
+            )
+            loaded += copy_batches(
+                connection,
+                "credit_card_transactions",
+                TRANSACTION_COLUMNS,
+                _csv_batches(
+                    iter_transactions(
+                        iter_customers(args.customers, args.seed, first_id=args.first_id), args.transactions, args.seed, args.days
+                    ),
+                    args.batch_size,
+                ),
+            )
+        else:
+            if args.customers_csv:
+                loaded += copy_batches(
+                    connection, "customerdata", CUSTOMER_COLUMNS, _file_batches(args.customers_csv, args.batch_size)
+                )
+            if args.transactions_csv:
+                loaded += copy_batches(
+                    connection,
+                    "credit_card_transactions",
+                    TRANSACTION_COLUMNS,
+                    _file_batches(args.transactions_csv, args.batch_size),
+                )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE customerdata")
+            cursor.execute("ANALYZE credit_card_transactions")
+        connection.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {loaded:,} rows in {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:,.0f} rows/s)")
+    except Exception as e:
+        connection.rollback()
+        print(f"Load failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+-- Production variant of setup_db.sql for realistic data volumes.
+-- Same tables and columns as the demo schema, created with their final types, plus:
+--   * a primary key and a credit_card_no index on CustomerData
+--   * credit_card_transactions range-partitioned by month on date
+--   * indexes on (credit_card_no, date) so the "more than 3 authentication failures
+--     recently" check is an index range scan on the recent partitions only
+-- Fill it with resources/setup/generate_data.py and resources/setup/load_data.py.
+
+-- Create accounts table
+CREATE TABLE accounts (
+    account_id SERIAL PRIMARY KEY,
+    name VARCHAR(50) NOT NULL,
+    email VARCHAR(255),
+    phone VARCHAR(20),
+    balance DECIMAL(10, 2)
+);
+
+-- Create CustomerData table
+CREATE TABLE CustomerData (
+    customer_id INTEGER PRIMARY KEY,
+    card_blocked BOOLEAN NOT NULL,
+    payment_due BOOLEAN NOT NULL,
+    card_type VARCHAR(50) NOT NULL,
+    credit_card_no BIGINT NOT NULL
+);
+
+CREATE INDEX customerdata_credit_card_no_idx ON CustomerData (credit_card_no);
+
+-- Create credit_card_transactions table, partitioned by month
+CREATE TABLE credit_card_transactions (
+    transaction_id BIGINT GENERATED ALWAYS AS IDENTITY,
+    credit_card_no BIGINT NOT NULL,
+    date TIMESTAMP NOT NULL,
+    amount DECIMAL(10, 2),
+    authentication_passed BOOLEAN,
+    location VARCHAR(255),
+    PRIMARY KEY (transaction_id, date)
+) PARTITION BY RANGE (date);
+
+-- Indexes declared on the parent are created on every partition
+CREATE INDEX credit_card_transactions_card_date_idx ON credit_card_transactions (credit_card_no, date);
+
+-- Failed authentications are rare, so a partial index keeps the failure count lookup small
+CREATE INDEX credit_card_transactions_auth_failures_idx ON credit_card_transactions (credit_card_no, date)
+    WHERE authentication_passed = FALSE;
+
+-- Monthly partitions from two years back to three months ahead, plus a default partition
+-- for anything outside that range. Re-run the block (or a cron job doing the same) to add
+-- the months ahead before they are reached.
+DO $$
+DECLARE
+    month_start DATE := date_trunc('month', NOW() - INTERVAL '24 months');
+    last_month DATE := date_trunc('month', NOW() + INTERVAL '3 months');
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS credit_card_transactions_%s PARTITION OF credit_card_transactions
+                 FOR VALUES FROM (%L) TO (%L)',
+            to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+CREATE TABLE credit_card_transactions_default PARTITION OF credit_card_transactions DEFAULT;
+
+-- Demo rows used by the agents, with the values setup_db.sql ends up with
+INSERT INTO accounts (account_id, name, email, phone, balance)
+VALUES (1, 'HBL', 'abcd@gef.com', '9876543210', 99034.50),
+       (2, 'Vikas', 'abcd@gef.com', '9876543210', 123456.0);
+
+INSERT INTO CustomerData (customer_id, card_blocked, payment_due, card_type, credit_card_no)
+VALUES (123456, TRUE, TRUE, 'Visa', 4004158658075362),
+       (136743, TRUE, FALSE, 'MasterCard', 1234567812345678),
+       (3, FALSE, FALSE, 'American Express', 1234567812345678),
+       (4, TRUE, FALSE, 'Discover', 1234567812345678);
+
+INSERT INTO credit_card_transactions (credit_card_no, date, amount, authentication_passed, location)
+VALUES (4004158658075362, NOW(), 256.17, FALSE, 'San Francisco'),
+       (4004158658075362, NOW(), 123.72, FALSE, 'San Francisco'),
+       (4004158658075362, NOW(), 876.07, FALSE, 'San Francisco'),
+       (4004158658075362, NOW(), 965.89, FALSE, 'San Francisco'),
+       (4004158658075362, NOW(), 214.38, FALSE, 'San Francisco');
+
+ANALYZE CustomerData;
+ANALYZE credit_card_transactions;
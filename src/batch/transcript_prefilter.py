@@ -0,0 +1,62 @@
+"""
+Local pre-stage for transcript triage: deterministic customer id and card keyword scoring.
+
+The transcripts open with a ``Customer ID : 123456`` header, so the id is read with a
+regular expression instead of asking the model for it. The conversation itself is scored
+with compiled keyword patterns, and only a transcript that talks about a card and about
+blocking it (score >= threshold) needs the model to decide; any other one is answered
+"not blocked" locally.
+
+    card term      card, debit, credit, visa, atm, pin...            2
+    block term     blocked, frozen, locked, declined, stolen...      1
+"""
+import re
+
+DEFAULT_THRESHOLD = 3
+
+_CUSTOMER_ID = re.compile(r"^\s*Customer\s*ID\s*:\s*(\d+)", re.IGNORECASE | re.MULTILINE)
+# The conversation, without the header lines
+_CONVERSATION = re.compile(r"Call\s+Transcript\s*:", re.IGNORECASE)
+_CARD_TERMS = re.compile(r"\b(?:cards?|debit|credit|visa|mastercard|amex|atm|pin)\b", re.IGNORECASE)
+_BLOCK_TERMS = re.compile(
+    r"\b(?:un)?(?:block(?:ed|ing)?|frozen|freeze|lock(?:ed)?|declined|suspended|deactivated|stolen|lost|cancell?ed|stopped)\b",
+    re.IGNORECASE,
+)
+_WEIGHTS = ((_CARD_TERMS, 2), (_BLOCK_TERMS, 1))
+
+
+def extract_customer_id(transcript: str) -> str:
+    """The id from the transcript's ``Customer ID :`` header, or "" when it has none."""
+    match = _CUSTOMER_ID.search(transcript)
+    return match.group(1) if match else ""
+
+
+def card_score(transcript: str) -> int:
+    """
+    Scores how plausibly ``transcript`` is about a blocked card, by the keyword groups it
+    mentions in the conversation.
+
+    :param transcript (str): the call transcript, header included.
+    :return: the sum of the weights of the groups found.
+    :rtype: int
+    """
+    header = _CONVERSATION.search(transcript)
+    conversation = transcript[header.end():] if header else transcript
+    return sum(weight for pattern, weight in _WEIGHTS if pattern.search(conversation))
+
+
+def prefilter(item: dict, threshold: int = DEFAULT_THRESHOLD) -> dict:
+    """
+    Runs the local pre-stage on one transcript.
+
+    :param item (dict): ``{"id", "transcript", "customer"}`` as read by the triage CLI.
+    :param threshold (int): lowest score sent to the model.
+    :return: customer (from the item or the header), score and whether the model is needed.
+    :rtype: dict
+    """
+    score = card_score(item["transcript"])
+    return {
+        "customer": item.get("customer") or extract_customer_id(item["transcript"]),
+        "score": score,
+        "needs_model": score >= threshold,
+    }
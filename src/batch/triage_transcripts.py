@@ -0,0 +1,286 @@
+"""
+Batch triage of call transcripts with the blocked_card / blocked_reason prompt functions.
+
+Transcripts are read lazily from a directory of .txt files (the file name is the id) or a
+JSONL file of {"id": ..., "transcript": ..., "customer": ...} lines, and classified by
+--concurrency workers through the prompt functions in src/plugins/prompt_templates/func,
+compiled once by the shared prompt registry, which also picks up edits to the templates
+while a long run is going.
+A failed call is retried --retries times with exponential backoff and jitter (rate limits
+included), and an answer that cannot be parsed is asked for again right away. Every result is appended to the output JSONL as soon as it is known; the output
+is also the checkpoint: on a rerun, transcripts with a result in it are skipped and those
+that failed are tried again.
+
+Before the model, transcript_prefilter reads the customer id from the transcript header and
+scores the conversation for card and blocking keywords; transcripts scoring under
+--threshold are answered "not blocked" locally ("source": "prefilter") without a model
+call. The header's id is passed to the prompt as the customer, so the model is not asked
+to find it again, and is written as "customer"; the model's id is only used for
+transcripts without a header. --no-prefilter sends every transcript to the model, which
+is how labels for src/benchmarks/bench_transcript_prefilter.py are made.
+
+The chat service comes from the registry shared with the Chainlit apps, so the response
+cache applies and CHAT_COMPLETION_BACKEND=local classifies offline by keyword.
+
+USAGE:
+    python src/batch/triage_transcripts.py resources/transcripts --out triage.jsonl
+    python src/batch/triage_transcripts.py nightly.jsonl --out nightly_triage.jsonl --concurrency 32 --function blocked_card_structured
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+
+from dotenv import load_dotenv
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from prompt_registry import get_prompt_registry
+from service_registry import close, get_chat_service
+from structured_logging import setup_logging
+from transcript_prefilter import DEFAULT_THRESHOLD, prefilter
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+FUNCTIONS = ("blocked_reason", "blocked_card", "blocked_card_structured")
+
+_REASON_OUTPUT = re.compile(r"Card\s+(not\s+)?blocked\s+for\s+customer\s*:\s*(\S+)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class BlockedCard:
+    """The answer of blocked_card_structured."""
+
+    customer: str
+    card_blocked: bool
+
+
+def parse_blocked_card(output: str) -> BlockedCard:
+    """
+    Parses the output of blocked_card_structured, which must match its response schema
+    exactly: no code fence, no other keys, a string customer and a boolean card_blocked.
+
+    :param output (str): the model's answer.
+    :return: the typed answer.
+    :rtype: BlockedCard
+    :raises ValueError: when the output does not match the schema.
+    """
+    answer = json.loads(output)
+    if (
+        not isinstance(answer, dict)
+        or answer.keys() != {"customer", "card_blocked"}
+        or not isinstance(answer["customer"], str)
+        or not isinstance(answer["card_blocked"], bool)
+    ):
+        raise ValueError(f"Output does not match the blocked_card schema: {output[:100]!r}")
+    return BlockedCard(answer["customer"], answer["card_blocked"])
+
+
+def read_transcripts(source: str) -> Iterator[dict]:
+    """
+    Yields ``{"id", "transcript", "customer"}`` for every transcript in ``source``, a
+    directory of .txt files or a JSONL file, one at a time.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                with open(os.path.join(source, name), encoding="utf-8") as file:
+                    yield {"id": os.path.splitext(name)[0], "transcript": file.read(), "customer": ""}
+        return
+    with open(source, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield {
+                "id": str(entry.get("id", number)),
+                "transcript": entry.get("transcript") or entry.get("text", ""),
+                "customer": str(entry.get("customer", "")),
+            }
+
+
+def read_checkpoint(path: str) -> set[str]:
+    """Ids of the transcripts that already have a result in the output file ``path``."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if "error" not in entry:
+                done.add(entry["id"])
+    return done
+
+
+def parse_output(function_name: str, output: str) -> dict:
+    """
+    Reads the card_blocked verdict and customer id from the output of ``function_name``.
+
+    :param function_name (str): one of FUNCTIONS.
+    :param output (str): the model's answer.
+    :return: card_blocked (bool or None when unreadable) and customer.
+    :rtype: dict
+    """
+    if function_name == "blocked_card_structured":
+        try:
+            return asdict(parse_blocked_card(output))
+        except ValueError:
+            return {"card_blocked": None, "customer": ""}
+    if function_name == "blocked_card":
+        try:
+            answer = json.loads(output.strip().removeprefix("```json").removeprefix("```").removesuffix("```"))
+            return {"card_blocked": str(answer.get("card_blocked", "")).lower() == "yes", "customer": str(answer.get("customer", ""))}
+        except (json.JSONDecodeError, AttributeError):
+            return {"card_blocked": None, "customer": ""}
+    match = _REASON_OUTPUT.search(output)
+    if match is None:
+        return {"card_blocked": None, "customer": ""}
+    return {"card_blocked": match.group(1) is None, "customer": match.group(2)}
+
+
+async def classify(kernel: Kernel, function_name: str, item: dict, retries: int, backoff: float) -> dict:
+    """
+    Runs the prompt function on one transcript. A failed call is retried after a backoff,
+    an answer that cannot be parsed is asked again right away.
+    """
+    arguments = KernelArguments(transcript=item["transcript"], customer=item["customer"])
+    parse_failures = 0
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            # Looked up per call, so a reloaded template is used from the next transcript on
+            function = get_prompt_registry().get("func", function_name)
+            output = str(await kernel.invoke(function, arguments))
+        except Exception as e:
+            error, delay = str(e), backoff * 2**attempt * random.uniform(0.5, 1.5)
+        else:
+            parsed = parse_output(function_name, output)
+            if parsed["card_blocked"] is not None:
+                return {
+                    "id": item["id"],
+                    "function": function_name,
+                    **parsed,
+                    "output": output,
+                    "attempts": attempt + 1,
+                    "parse_failures": parse_failures,
+                    "latency_s": round(time.perf_counter() - started, 3),
+                }
+            parse_failures += 1
+            error, delay = f"Unparseable output: {output[:100]!r}", 0.0
+        if attempt == retries:
+            return {"id": item["id"], "function": function_name, "error": error, "attempts": attempt + 1, "parse_failures": parse_failures}
+        logger.warning("classification failed, retrying", extra={"id": item["id"], "attempt": attempt + 1, "delay_s": round(delay, 2), "error": error})
+        await asyncio.sleep(delay)
+
+
+async def run(args) -> dict:
+    kernel = Kernel()
+    kernel.add_service(get_chat_service("triage"))
+    registry = get_prompt_registry()
+    kernel.add_plugin(registry.plugin("func"))
+    registry.add_render_timing(kernel)
+    registry.watch()
+
+    done = read_checkpoint(args.out)
+    # Bounded, so a large JSONL is read as fast as the workers consume it
+    pending: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    counts = {"classified": 0, "failed": 0, "skipped": 0, "card_blocked": 0, "model_calls": 0, "model_calls_skipped": 0, "retries": 0, "parse_failures": 0}
+    started = time.perf_counter()
+
+    async def produce():
+        for item in read_transcripts(args.source):
+            if item["id"] in done:
+                counts["skipped"] += 1
+                continue
+            await pending.put(item)
+        for _ in range(args.concurrency):
+            await pending.put(None)
+
+    with open(args.out, "a", encoding="utf-8") as out:
+
+        async def work():
+            while (item := await pending.get()) is not None:
+                local = prefilter(item, args.threshold if args.prefilter else float("-inf"))
+                if local["needs_model"]:
+                    known = local["customer"] or item["customer"]
+                    result = await classify(kernel, args.function, {**item, "customer": known}, args.retries, args.backoff)
+                    # The header's id is authoritative, the model's is only a fallback
+                    result.update(customer=local["customer"] or result.get("customer", ""), source="model", score=local["score"])
+                    counts["model_calls"] += result["attempts"]
+                    counts["retries"] += result["attempts"] - 1
+                    counts["parse_failures"] += result["parse_failures"]
+                else:
+                    counts["model_calls_skipped"] += 1
+                    result = {
+                        "id": item["id"],
+                        "function": args.function,
+                        "card_blocked": False,
+                        "customer": local["customer"],
+                        "source": "prefilter",
+                        "score": local["score"],
+                    }
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                if "error" in result:
+                    counts["failed"] += 1
+                else:
+                    counts["classified"] += 1
+                    counts["card_blocked"] += bool(result["card_blocked"])
+                total = counts["classified"] + counts["failed"]
+                if total % args.progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    logger.info("progress", extra={**counts, "transcripts_per_min": round(total * 60 / elapsed, 1)})
+
+        await asyncio.gather(produce(), *(work() for _ in range(args.concurrency)))
+
+    registry.stop()
+    await close()
+    elapsed = time.perf_counter() - started
+    return {
+        "source": args.source,
+        "out": args.out,
+        "function": args.function,
+        "concurrency": args.concurrency,
+        "prefilter_threshold": args.threshold if args.prefilter else None,
+        **counts,
+        "retry_rate": round(counts["retries"] / counts["model_calls"], 4) if counts["model_calls"] else 0.0,
+        "parse_failure_rate": round(counts["parse_failures"] / counts["model_calls"], 4) if counts["model_calls"] else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "transcripts_per_min": round((counts["classified"] + counts["failed"]) * 60 / elapsed, 1) if elapsed else 0.0,
+        "prompt_templates": registry.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of .txt transcripts or a JSONL file")
+    parser.add_argument("--out", required=True, help="JSONL file the results are appended to, and resumed from")
+    parser.add_argument("--function", choices=FUNCTIONS, default="blocked_reason")
+    parser.add_argument("--concurrency", type=int, default=8, help="transcripts classified at the same time")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="delay before the first retry (s), doubled each time")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD, help="lowest keyword score sent to the model")
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false", help="send every transcript to the model")
+    parser.add_argument("--progress-every", type=int, default=100, help="log progress every N transcripts")
+    args = parser.parse_args()
+    setup_logging()
+    # One record per function call otherwise
+    logging.getLogger("semantic_kernel").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Sessions-per-second benchmark for the DatabaseConnector against a local PostgreSQL.
+
+Every simulated chat alternates "model think time" (an asyncio sleep standing in for the
+LLM round trip) with a database lookup, the same way the BusinessAnalyst agent does.
+Two modes are compared:
+
+    blocking  one psycopg2 connection, cursor.execute called straight from the coroutine
+              (what every app did before the pool was introduced)
+    pool      the shared ConnectionPool behind DatabaseConnector.query_database
+
+USAGE:
+    python src/benchmarks/bench_db_pool.py --sessions 200 --concurrency 50 --turns 3
+    python src/benchmarks/bench_db_pool.py --mode pool --pool-size 20 --query-delay 0.05
+
+The DB_* variables from .env select the database (see resources/setup/setup_db.sql).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from database_connector import ConnectionPool, DatabaseConnector
+
+load_dotenv()
+
+QUERY = "SELECT customer_id, card_blocked, payment_due, card_type, credit_card_no FROM customerdata WHERE customer_id = 123456"
+
+
+def _query(delay: float) -> str:
+    if delay:
+        return f"SELECT pg_sleep({delay}), * FROM ({QUERY}) AS customer"
+    return QUERY
+
+
+async def _blocking_chat(cursor, turns: int, think_time: float, delay: float) -> None:
+    for _ in range(turns):
+        await asyncio.sleep(think_time)
+        cursor.execute(_query(delay))
+        cursor.fetchone()
+
+
+async def _pooled_chat(connector: DatabaseConnector, turns: int, think_time: float, delay: float) -> None:
+    for _ in range(turns):
+        await asyncio.sleep(think_time)
+        result = json.loads(await connector.query_database(_query(delay)))
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+
+async def run(args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    connection = None
+    pool = None
+
+    if args.mode == "blocking":
+        connection = psycopg2.connect(
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+        )
+        connection.autocommit = True
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+
+        def chat():
+            return _blocking_chat(cursor, args.turns, args.think_time, args.query_delay)
+    else:
+        pool = ConnectionPool.from_env(min_size=1, max_size=args.pool_size)
+        await pool.open()
+        connector = DatabaseConnector(pool=pool)
+
+        def chat():
+            return _pooled_chat(connector, args.turns, args.think_time, args.query_delay)
+
+    async def session():
+        async with semaphore:
+            await chat()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    if connection is not None:
+        connection.close()
+    if pool is not None:
+        await pool.close()
+
+    return {
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "turns": args.turns,
+        "pool_size": args.pool_size if args.mode == "pool" else 1,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(args.sessions / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["blocking", "pool", "both"], default="both")
+    parser.add_argument("--sessions", type=int, default=200, help="number of simulated chats")
+    parser.add_argument("--concurrency", type=int, default=50, help="chats running at the same time")
+    parser.add_argument("--turns", type=int, default=3, help="database lookups per chat")
+    parser.add_argument("--think-time", type=float, default=0.2, help="simulated model latency per turn (s)")
+    parser.add_argument("--query-delay", type=float, default=0.0, help="extra server-side time per query (s)")
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    modes = ["blocking", "pool"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        args.mode = mode
+        print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Per-turn latency of the analyst's tool calls, run one after another versus concurrently.
+
+Every simulated session runs --turns turns inside ConnectionPool.turn, the way on_message
+in app_blocked_card.py does. A turn waits --think-time (the model round trip) and then
+executes the tool calls of one model response with Kernel.invoke_function_call under
+asyncio.gather, as Semantic Kernel's auto function invocation loop does: the customer row
+and the count of failed authentications through DatabaseConnector.query_database, each
+slowed down by --query-delay on the server.
+
+    serialized  the calls share the turn's connection and wait for each other (before)
+    parallel    a call issued while the turn's connection is busy leases its own
+
+tools_ms is the time from the first tool call of a response to the last result.
+Lookups bypass the query cache so every one reaches PostgreSQL.
+
+USAGE:
+    python src/benchmarks/bench_parallel_tools.py --sessions 20 --turns 5 --query-delay 0.05
+    python src/benchmarks/bench_parallel_tools.py --sessions 100 --pool-size 20 --session-connections 2
+
+The DB_* variables from .env select the database; it needs the demo rows of
+resources/setup/setup_db.sql (customer 123456).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+from semantic_kernel import Kernel
+from semantic_kernel.contents import ChatHistory, FunctionCallContent
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from database_connector import ConnectionPool, DatabaseConnector
+from query_cache import QueryCache
+
+load_dotenv()
+
+QUERIES = (
+    "SELECT customer_id, card_blocked, payment_due, card_type, credit_card_no FROM customerdata WHERE customer_id = 123456",
+    "SELECT count(*) AS failed_authentications FROM credit_card_transactions t JOIN customerdata c "
+    "ON c.credit_card_no = t.credit_card_no WHERE c.customer_id = 123456 AND t.authentication_passed = FALSE",
+)
+
+
+def _query(query: str, delay: float) -> str:
+    if delay:
+        return f"SELECT pg_sleep({delay}), * FROM ({query}) AS result"
+    return query
+
+
+async def _session(kernel: Kernel, pool: ConnectionPool, args, parallel: bool, tools_ms: list, errors: list):
+    limit = asyncio.Semaphore(args.session_connections)
+    async with pool.turn(limit, parallel) as lease:
+        for _ in range(args.turns):
+            await asyncio.sleep(args.think_time)
+            calls = [
+                FunctionCallContent(id=f"call_{index}", name="db_plugin-query_database", arguments={"query": _query(query, args.query_delay)})
+                for index, query in enumerate(QUERIES)
+            ]
+            history = ChatHistory()
+            started = time.perf_counter()
+            await asyncio.gather(*(kernel.invoke_function_call(call, history, function_call_count=len(calls)) for call in calls))
+            tools_ms.append((time.perf_counter() - started) * 1000)
+            for message in history.messages:
+                for item in message.items:
+                    if '"error"' in str(item.result):
+                        errors.append(str(item.result))
+            await lease.release()
+
+
+async def run(mode: str, args) -> dict:
+    pool = ConnectionPool.from_env(min_size=1, max_size=args.pool_size)
+    kernel = Kernel()
+    # A zero TTL stores nothing, so every lookup reaches the database
+    kernel.add_plugin(DatabaseConnector(pool=pool, cache=QueryCache(default_ttl=0)), plugin_name="db_plugin")
+    tools_ms, errors = [], []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_session(kernel, pool, args, mode == "parallel", tools_ms, errors) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    await pool.close()
+
+    tools_ms.sort()
+    return {
+        "mode": mode,
+        "sessions": args.sessions,
+        "turns": args.turns,
+        "tool_calls_per_turn": len(QUERIES),
+        "pool_size": args.pool_size,
+        "session_connections": args.session_connections,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "tools_ms_mean": round(statistics.fmean(tools_ms), 2),
+        "tools_ms_p50": round(tools_ms[len(tools_ms) // 2], 2),
+        "tools_ms_p95": round(tools_ms[int(len(tools_ms) * 0.95)], 2),
+        "turns_per_s": round(args.sessions * args.turns / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=5, help="analyst turns per session")
+    parser.add_argument("--think-time", type=float, default=0.2, help="simulated model latency per turn (s)")
+    parser.add_argument("--query-delay", type=float, default=0.05, help="extra server-side time per query (s)")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--session-connections", type=int, default=2, help="DB_SESSION_MAX_CONNECTIONS")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(mode, args)) for mode in ("serialized", "parallel")]
+    results[1]["saved_ms_per_turn"] = round(results[0]["tools_ms_mean"] - results[1]["tools_ms_mean"], 2)
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Cost of getting a rendered prompt ready, rebuilding the function from its files versus the registry.
+
+"rebuild" reads skprompt.txt and config.json and builds the KernelFunctionFromPrompt again
+before every render, as each notebook and batch worker used to; "registry" takes the
+function compiled once by PromptRegistry. Both then render the prompt for a transcript.
+
+USAGE:
+    python src/benchmarks/bench_prompt_registry.py --iterations 2000
+    python src/benchmarks/bench_prompt_registry.py --function blocked_card
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments, KernelFunctionFromPrompt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from prompt_registry import PROMPT_TEMPLATES, PromptRegistry
+
+TRANSCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "resources", "transcripts", "transcript1.txt")
+
+
+async def run_mode(mode: str, args, kernel: Kernel, arguments: KernelArguments) -> dict:
+    path = os.path.join(PROMPT_TEMPLATES, "func", args.function)
+    registry = PromptRegistry()
+    started = time.perf_counter()
+    registry.load()
+    startup_ms = (time.perf_counter() - started) * 1000 if mode == "registry" else 0.0
+    timings = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        if mode == "rebuild":
+            function = KernelFunctionFromPrompt.from_directory(path, plugin_name="func")
+        else:
+            function = registry.get("func", args.function)
+        await function.prompt_template.render(kernel, arguments)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "mode": mode,
+        "function": args.function,
+        "iterations": args.iterations,
+        "startup_ms": round(startup_ms, 3),
+        "mean_us": round(statistics.fmean(timings) * 1e6, 1),
+        "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--function", choices=("blocked_reason", "blocked_card"), default="blocked_reason")
+    args = parser.parse_args()
+    with open(TRANSCRIPT, encoding="utf-8") as file:
+        arguments = KernelArguments(transcript=file.read(), customer="123456")
+    kernel = Kernel()
+    for mode in ("rebuild", "registry"):
+        print(json.dumps(asyncio.run(run_mode(mode, args, kernel, arguments))))
+
+
+if __name__ == "__main__":
+    main()
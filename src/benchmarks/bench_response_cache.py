@@ -0,0 +1,139 @@
+"""
+Hit rate and saved model latency of the response cache on a repetitive workload.
+
+Requests are drawn from a skewed mix of the conversations these agents see most: the
+greeting, the customer ID exchange and weather questions for a handful of cities, plus a
+share of turns that carry a customer data tool result (which must never be cached).
+They are sent through CachedChatCompletion to a simulated model with a fixed latency, so
+the saved time is what the same requests would have cost against Azure OpenAI at that
+latency.
+
+USAGE:
+    python src/benchmarks/bench_response_cache.py --requests 2000 --latency 0.05
+    python src/benchmarks/bench_response_cache.py --disk-dir /tmp/chat-cache --stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
+from semantic_kernel.contents import (
+    ChatHistory,
+    ChatMessageContent,
+    FunctionCallContent,
+    FunctionResultContent,
+    StreamingChatMessageContent,
+)
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from response_cache import CachedChatCompletion, ResponseCache
+
+GREETINGS = ["Hi", "Hello", "hello ", "Hi there", "Good morning"]
+CITIES = ["Paris", "London", "Berlin", "New York", "Tokyo", "Madrid", "Rome", "Oslo"]
+
+
+class SimulatedChatCompletion(ChatCompletionClientBase):
+    """Answers with a canned reply after ``latency`` seconds."""
+
+    latency: float = 0.05
+    calls: int = 0
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, content=f"Reply to: {chat_history.messages[-1].content}")]
+
+    async def _inner_get_streaming_chat_message_contents(self, chat_history, settings, function_invoke_attempt=0):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for word in f"Reply to: {chat_history.messages[-1].content}".split(" "):
+            yield [StreamingChatMessageContent(role=AuthorRole.ASSISTANT, choice_index=0, content=word + " ")]
+
+
+def make_history(rng: random.Random) -> ChatHistory:
+    history = ChatHistory(system_message="You are a helpful banking assistant.")
+    kind = rng.choices(["greeting", "customer_id", "weather", "tool_result"], weights=[35, 25, 30, 10])[0]
+    if kind == "greeting":
+        history.add_user_message(rng.choice(GREETINGS))
+    elif kind == "customer_id":
+        history.add_user_message("My card is blocked")
+        history.add_assistant_message("Please provide your customer ID to continue.")
+        history.add_user_message("I don't know it, where do I find it?")
+    elif kind == "weather":
+        # Zipf-like: a few cities make up most of the questions
+        city = CITIES[min(int(rng.paretovariate(1.2)) - 1, len(CITIES) - 1)]
+        history.add_user_message(f"What is the weather in {city}?")
+    else:
+        customer_id = rng.randrange(100000, 200000)
+        history.add_user_message(f"My customer ID is {customer_id}")
+        history.add_message(
+            ChatMessageContent(
+                role=AuthorRole.ASSISTANT,
+                items=[FunctionCallContent(id="1", name="blocked_card-get_customer_card_status", arguments="{}")],
+            )
+        )
+        history.add_message(
+            ChatMessageContent(
+                role=AuthorRole.TOOL,
+                items=[
+                    FunctionResultContent(
+                        id="1",
+                        name="blocked_card-get_customer_card_status",
+                        result=json.dumps({"customer_id": customer_id, "card_blocked": True}),
+                    )
+                ],
+            )
+        )
+    return history
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    inner = SimulatedChatCompletion(service_id="agent", ai_model_id="simulated", latency=args.latency)
+    path = os.path.join(args.disk_dir, "responses.sqlite3") if args.disk_dir else None
+    cache = ResponseCache(ttl=args.ttl, max_entries=args.max_entries, path=path)
+    service = CachedChatCompletion.wrap(inner, cache)
+    settings = OpenAIChatPromptExecutionSettings(temperature=0)
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        history = make_history(rng)
+        if args.stream:
+            async for _ in service.get_streaming_chat_message_contents(history, settings):
+                pass
+        else:
+            await service.get_chat_message_contents(history, settings)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": args.requests,
+        "stream": args.stream,
+        "disk_tier": bool(path),
+        "model_calls": inner.calls,
+        "elapsed_s": round(elapsed, 3),
+        "uncached_estimate_s": round(args.requests * args.latency, 3),
+        **cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated model latency (s)")
+    parser.add_argument("--ttl", type=float, default=600)
+    parser.add_argument("--max-entries", type=int, default=512)
+    parser.add_argument("--disk-dir", help="enable the disk tier in this directory")
+    parser.add_argument("--stream", action="store_true", help="use the streaming API")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Micro-benchmark of the DatabaseConnector result encoding, through the call paths the
+tools use, on credit_card_transactions shaped rows served by an in-memory cursor (so only
+the Python side is timed).
+
+    paged       query_database_paged: database_connector._fetch_page followed by
+                ResultEncoder.envelope, for --rows rows read --page-size at a time
+    single      query_database and BlockedCardPlugin: one row, ResultEncoder.record
+                and json.dumps, timed over --calls calls
+
+and, for each, the code they replaced:
+
+    legacy      RealDictCursor rows; the paged path serialized every row to measure the
+                byte budget, walked the rows turning Decimal into str, then serialized
+                the page again with json.dumps(default=str); the single row path did the
+                Decimal walk and json.dumps
+
+USAGE:
+    python src/benchmarks/bench_result_encoder.py --rows 10000 --repeat 20
+    python src/benchmarks/bench_result_encoder.py --repeat 2000 --calls 10 --max-rows 100 --max-bytes 8000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from database_connector import _fetch_page
+from result_encoder import INT8_OID, NUMERIC_OID, TIMESTAMP_OID, ResultEncoder
+
+BOOL_OID = 16
+VARCHAR_OID = 1043
+
+COLUMNS = [
+    ("credit_card_no", INT8_OID),
+    ("date", TIMESTAMP_OID),
+    ("amount", NUMERIC_OID),
+    ("authentication_passed", BOOL_OID),
+    ("location", VARCHAR_OID),
+]
+LOCATIONS = ["Houston", "New York", "San Francisco", "Chicago", "Los Angeles", "Seattle", "Phoenix"]
+
+
+def make_rows(count: int) -> list:
+    rng = random.Random(42)
+    start = datetime.datetime(2024, 4, 1, 16, 14, 17)
+    return [
+        (
+            rng.randrange(4000000000000000, 4999999999999999),
+            start + datetime.timedelta(minutes=rng.randrange(0, 500000)),
+            Decimal(rng.randrange(100, 100000)) / 100,
+            rng.random() > 0.3,
+            rng.choice(LOCATIONS),
+        )
+        for _ in range(count)
+    ]
+
+
+class _Cursor:
+    """The part of a psycopg2 (named) cursor _fetch_page uses, over rows held in memory."""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.description = COLUMNS
+        self.position = 0
+        self.itersize = 2000
+
+    def execute(self, query):
+        self.position = 0
+
+    def scroll(self, offset):
+        self.position += offset
+
+    def fetchmany(self, size):
+        page = self.rows[self.position : self.position + size]
+        self.position += len(page)
+        # RealDictCursor hands out fresh dicts on every fetch
+        return [dict(row) for row in page] if page and isinstance(page[0], dict) else page
+
+    def fetchone(self):
+        page = self.fetchmany(1)
+        return page[0] if page else None
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, rows: list):
+        names = [name for name, _ in COLUMNS]
+        self._rows = rows
+        self._dict_rows = [dict(zip(names, row)) for row in rows]
+
+    def cursor(self, name=None, cursor_factory=None):
+        return _Cursor(self._dict_rows if cursor_factory is RealDictCursor else self._rows)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def _legacy_fetch_page(connection, offset: int, page_size: int, max_rows: int, max_bytes: int):
+    rows = []
+    size = 0
+    stopped_by = None
+    has_more = False
+    cursor = connection.cursor(name="page", cursor_factory=RealDictCursor)
+    cursor.execute(query="")
+    if offset:
+        cursor.scroll(offset)
+    while stopped_by is None:
+        page = cursor.fetchmany(page_size)
+        if not page:
+            break
+        for row in page:
+            row_size = len(json.dumps(row, default=str))
+            if rows and size + row_size > max_bytes:
+                stopped_by = "max_bytes"
+            elif len(rows) >= max_rows:
+                stopped_by = "max_rows"
+            if stopped_by is not None:
+                has_more = True
+                break
+            rows.append(row)
+            size += row_size
+        else:
+            if len(rows) >= max_rows and len(page) == page_size:
+                has_more = cursor.fetchone() is not None
+                stopped_by = "max_rows" if has_more else None
+                break
+    cursor.close()
+    return rows, offset + len(rows) if has_more else None, stopped_by
+
+
+def paged_legacy(connection, args) -> str:
+    rows, next_offset, stopped_by = _legacy_fetch_page(connection, 0, args.page_size, args.max_rows, args.max_bytes)
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, Decimal):
+                row[key] = str(value)
+    return json.dumps(
+        {"rows": rows, "row_count": len(rows), "offset": 0, "continuation_token": None, "truncated_by": stopped_by},
+        default=str,
+    )
+
+
+def paged(layout: str):
+    def run(connection, args) -> str:
+        rows, row_count, encoder, next_offset, stopped_by = _fetch_page(
+            connection, "", 0, args.page_size, args.max_rows, args.max_bytes, layout
+        )
+        return encoder.envelope(rows, layout, row_count=row_count, offset=0, continuation_token=None, truncated_by=stopped_by)
+
+    return run
+
+
+def single_legacy(connection, args) -> str:
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    output = ""
+    for _ in range(args.calls):
+        row = cursor.fetchone() or cursor.scroll(-cursor.position) or cursor.fetchone()
+        for key, value in row.items():
+            if isinstance(value, Decimal):
+                row[key] = str(value)
+        output = json.dumps({"result_record": row}, default=str)
+    return output
+
+
+def single(connection, args) -> str:
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    output = ""
+    for _ in range(args.calls):
+        row = cursor.fetchone() or cursor.scroll(-cursor.position) or cursor.fetchone()
+        output = json.dumps({"result_record": ResultEncoder(cursor.description).record(row)})
+    return output
+
+
+def measure(run, connection, args) -> dict:
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        output = run(connection, args)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "median_ms": round(timings[len(timings) // 2] * 1000, 2),
+        "min_ms": round(timings[0] * 1000, 2),
+        "bytes": len(output.encode("utf-8")),
+        # ~4 characters per token is the usual estimate for English/JSON text
+        "approx_tokens": len(output) // 4,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=10000, help="single row lookups per repeat")
+    parser.add_argument("--page-size", type=int, default=50, help="rows per fetchmany, query_database_paged's default")
+    parser.add_argument("--max-rows", type=int, help="row limit of the paged path, --rows by default")
+    parser.add_argument("--max-bytes", type=int, default=10**9, help="byte budget of the paged path, large enough for every row by default")
+    args = parser.parse_args()
+    args.max_rows = args.max_rows or args.rows
+
+    connection = _Connection(make_rows(args.rows))
+    paths = {
+        "paged": {"legacy": paged_legacy, "records": paged("records"), "columnar": paged("columnar")},
+        "single": {"legacy": single_legacy, "records": single},
+    }
+    for path, runs in paths.items():
+        results = {name: measure(run, connection, args) for name, run in runs.items()}
+        baseline = results["legacy"]["median_ms"]
+        for name, result in results.items():
+            result["speedup"] = round(baseline / result["median_ms"], 2) if result["median_ms"] else None
+            size = {"rows": args.rows, "max_rows": args.max_rows} if path == "paged" else {"calls": args.calls}
+            print(json.dumps({"path": path, "encoder": name, **size, **result}))
+
+
+if __name__ == "__main__":
+    main()
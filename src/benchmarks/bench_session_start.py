@@ -0,0 +1,119 @@
+"""
+Session start latency and memory per session, per-session construction versus the
+service registry.
+
+    per_session  what on_chat_start used to do: a new Kernel, a new AzureChatCompletion
+                 (with its own HTTP client), a new DatabaseConnector reflected into a
+                 plugin, an agent and a ChatHistory for every session
+    registry     what on_chat_start does now: the shared agent from service_registry
+                 plus a new ChatHistory
+
+Every session's objects are kept alive, as Chainlit's user_session would, so the
+tracemalloc delta divided by the session count is the memory each session holds. No
+request is sent, so the saved TLS handshakes are not part of the numbers; with the
+registry every session reuses the warm connections of the shared HTTP client.
+
+USAGE:
+    python src/benchmarks/bench_session_start.py --sessions 1000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from semantic_kernel import Kernel
+from semantic_kernel.agents import ChatCompletionAgent
+from semantic_kernel.connectors.ai import FunctionChoiceBehavior
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from semantic_kernel.contents import ChatHistory
+from semantic_kernel.functions import KernelArguments
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+# Nothing is sent, placeholders are enough to build the services
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "placeholder")
+os.environ.setdefault("AZURE_OPENAI_CHAT_COMPLETION_MODEL", "placeholder")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://placeholder.openai.azure.com")
+
+import service_registry
+from database_connector import DatabaseConnector
+
+INSTRUCTIONS = "You are a helpful Software Engineer with expertise in SQL queries."
+
+
+def _agent(kernel: Kernel) -> ChatCompletionAgent:
+    settings = kernel.get_prompt_execution_settings_from_service_id(service_id="agent")
+    settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
+    return ChatCompletionAgent(
+        kernel=kernel, name="Host", instructions=INSTRUCTIONS, arguments=KernelArguments(settings=settings)
+    )
+
+
+def start_per_session() -> dict:
+    kernel = Kernel()
+    kernel.add_service(
+        AzureChatCompletion(
+            service_id="agent",
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        )
+    )
+    kernel.add_plugin(DatabaseConnector(), plugin_name="db_plugin")
+    return {"current_agent": _agent(kernel), "chat_history": ChatHistory()}
+
+
+def start_registry() -> dict:
+    def create_agent() -> ChatCompletionAgent:
+        return _agent(service_registry.get_kernel("host", plugins={"db_plugin": DatabaseConnector}))
+
+    return {"current_agent": service_registry.shared("agent:host", create_agent), "chat_history": ChatHistory()}
+
+
+def measure(name: str, start, sessions: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    kept = []
+    latencies = []
+    for _ in range(sessions):
+        started = time.perf_counter()
+        kept.append(start())
+        latencies.append((time.perf_counter() - started) * 1000)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    first = latencies[0]
+    latencies.sort()
+    return {
+        "mode": name,
+        "sessions": sessions,
+        "first_ms": round(first, 3),
+        "mean_ms": round(statistics.fmean(latencies), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 4),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 4),
+        "kb_per_session": round((current - baseline) / sessions / 1024, 2),
+        "peak_mb": round((peak - baseline) / 1024 / 1024, 2),
+    }
+
+
+async def run(sessions: int) -> None:
+    # The registry's HTTP client is bound to the running event loop, as in Chainlit
+    print(json.dumps(measure("per_session", start_per_session, sessions)))
+    print(json.dumps(measure("registry", start_registry, sessions)))
+    await service_registry.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions))
+
+
+if __name__ == "__main__":
+    main()
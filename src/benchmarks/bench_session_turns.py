@@ -0,0 +1,90 @@
+"""
+Load test of per-turn database leases: group chat turns per second against the number of
+concurrent chat sessions.
+
+Every simulated session runs --turns analyst turns. A turn waits --think-time (standing
+in for the model round trip), then makes the two BlockedCardPlugin lookups inside
+ConnectionPool.turn, the way on_message in app_blocked_card.py does, and releases its
+connection. Lookups bypass the query cache so every one reaches PostgreSQL.
+
+    shared  a one-connection pool, i.e. every session funnelling through one connection
+    leased  a --pool-size pool, one lease per turn, DB_SESSION_MAX_CONNECTIONS per session
+
+USAGE:
+    python src/benchmarks/bench_session_turns.py --sessions 1,10,25,50,100 --turns 5 --pool-size 20
+
+The DB_* variables from .env select the database; it needs the demo rows of
+resources/setup/setup_db.sql (customer 123456).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from blocked_card_plugin import BlockedCardPlugin
+from database_connector import ConnectionPool, session_limit
+from query_cache import QueryCache
+
+load_dotenv()
+
+
+async def _session(plugin: BlockedCardPlugin, pool: ConnectionPool, turns: int, think_time: float, customer_id: int):
+    limit = session_limit()
+    async with pool.turn(limit) as lease:
+        for _ in range(turns):
+            await asyncio.sleep(think_time)
+            status = json.loads(await plugin.get_customer_card_status(customer_id))
+            if "error" in status:
+                raise RuntimeError(status["error"])
+            failures = json.loads(await plugin.count_recent_auth_failures(str(status["credit_card_no"])))
+            if "error" in failures:
+                raise RuntimeError(failures["error"])
+            await lease.release()
+
+
+async def run(mode: str, sessions: int, args) -> dict:
+    pool = ConnectionPool.from_env(min_size=1, max_size=1 if mode == "shared" else args.pool_size)
+    await pool.open()
+    # A zero TTL stores nothing, so every lookup reaches the database
+    plugin = BlockedCardPlugin(pool=pool, cache=QueryCache(default_ttl=0))
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_session(plugin, pool, args.turns, args.think_time, args.customer_id) for _ in range(sessions))
+    )
+    elapsed = time.perf_counter() - started
+    await pool.close()
+
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "turns": args.turns,
+        "pool_size": pool.max_size,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(sessions * args.turns / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["shared", "leased", "both"], default="both")
+    parser.add_argument("--sessions", default="1,10,25,50,100", help="comma separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=5, help="analyst turns per session")
+    parser.add_argument("--think-time", type=float, default=0.2, help="simulated model latency per turn (s)")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--customer-id", type=int, default=123456)
+    args = parser.parse_args()
+
+    modes = ["shared", "leased"] if args.mode == "both" else [args.mode]
+    for sessions in (int(count) for count in args.sessions.split(",")):
+        for mode in modes:
+            print(json.dumps(asyncio.run(run(mode, sessions, args))))
+
+
+if __name__ == "__main__":
+    main()
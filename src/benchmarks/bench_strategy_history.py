@@ -0,0 +1,168 @@
+"""
+Prompt size of the group chat selection/termination prompts against conversation length,
+with the full history versus the RollingSummaryReducer window.
+
+A synthetic blocked card conversation is replayed turn by turn (user question, triage
+hand-off, analyst tool call and result, analyst reply, triage email with approval). After
+every message the strategy prompt is rendered both ways, as the strategies would render
+it, and its token count is recorded. Token counts use tiktoken when its encoding is
+available locally and fall back to characters / 4 otherwise.
+
+Besides the per-turn sizes it prints the cumulative prompt tokens of the whole
+conversation, which is what grows quadratically with the full history.
+
+USAGE:
+    python src/benchmarks/bench_strategy_history.py --turns 20 --window 6
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from semantic_kernel import Kernel
+from semantic_kernel.contents import ChatMessageContent, FunctionCallContent, FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.functions import KernelArguments, KernelFunctionFromPrompt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from history_window import RollingSummaryReducer
+
+PROMPT = """
+Determine which participant takes the next turn in a conversation based on the the most recent participant.
+State only the name of the participant to take the next turn.
+
+History:
+{{$history}}
+"""
+
+
+def token_counter():
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "tiktoken", lambda text: len(encoding.encode(text))
+    except Exception:
+        return "chars/4", lambda text: len(text) // 4
+
+
+def conversation_turn(turn: int) -> list[ChatMessageContent]:
+    customer_id = 100000 + turn
+    call_id = f"call_{turn}"
+    return [
+        ChatMessageContent(role=AuthorRole.USER, content=f"Hi, my card is blocked. My customer id is {customer_id}."),
+        ChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            name="TriageAgent",
+            content=f"@BusinessAnalyst please determine why the card of customer {customer_id} is blocked.",
+        ),
+        ChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            name="BusinessAnalyst",
+            items=[
+                FunctionCallContent(
+                    id=call_id,
+                    name="blocked_card-count_recent_auth_failures",
+                    arguments=json.dumps({"card_no": "4004158658075362", "window": 30}),
+                )
+            ],
+        ),
+        ChatMessageContent(
+            role=AuthorRole.TOOL,
+            items=[
+                FunctionResultContent(
+                    id=call_id,
+                    name="blocked_card-count_recent_auth_failures",
+                    result=json.dumps(
+                        {
+                            "credit_card_no": "4004158658075362",
+                            "window_days": 30,
+                            "failed_authentications": 5,
+                            "last_failure": "2025-01-14T10:22:31",
+                            "blocked_due_to_authentication_failures": True,
+                        }
+                    ),
+                )
+            ],
+        ),
+        ChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            name="BusinessAnalyst",
+            content=f"@TriageAgent The card of customer {customer_id} is blocked because of 5 failed "
+            "authentications in the last 30 days, more than the limit of 3.",
+        ),
+        ChatMessageContent(
+            role=AuthorRole.ASSISTANT,
+            name="TriageAgent",
+            content="Dear customer, your card was blocked after several failed authentication attempts. "
+            "Please visit a branch with a valid ID to unblock it. Kind regards, Card Services. "
+            "The analysis is approved.",
+        ),
+    ]
+
+
+async def render(function: KernelFunctionFromPrompt, kernel: Kernel, history: list[ChatMessageContent]) -> str:
+    messages = [message.to_dict(role_key="role", content_key="content") for message in history]
+    return await function.prompt_template.render(kernel, KernelArguments(history=messages))
+
+
+async def run(turns: int, window: int) -> None:
+    counter_name, count_tokens = token_counter()
+    kernel = Kernel()
+    function = KernelFunctionFromPrompt(function_name="selection", prompt=PROMPT)
+    reducer = RollingSummaryReducer(target_count=window)
+
+    history: list[ChatMessageContent] = []
+    totals = {"full": 0, "window": 0}
+    reduce_seconds = 0.0
+    for turn in range(1, turns + 1):
+        for message in conversation_turn(turn):
+            history.append(message)
+            full = count_tokens(await render(function, kernel, history))
+
+            started = time.perf_counter()
+            reducer.messages = history
+            reduced = await reducer.reduce()
+            reduce_seconds += time.perf_counter() - started
+            windowed = count_tokens(await render(function, kernel, reduced.messages if reduced else history))
+
+            totals["full"] += full
+            totals["window"] += windowed
+        print(
+            json.dumps(
+                {
+                    "turn": turn,
+                    "messages": len(history),
+                    "prompt_tokens_full": full,
+                    "prompt_tokens_window": windowed,
+                }
+            )
+        )
+
+    print(
+        json.dumps(
+            {
+                "turns": turns,
+                "window": window,
+                "token_counter": counter_name,
+                "cumulative_prompt_tokens_full": totals["full"],
+                "cumulative_prompt_tokens_window": totals["window"],
+                "saved": round(1 - totals["window"] / totals["full"], 3),
+                "reduce_ms_per_call": round(reduce_seconds * 1000 / len(history), 4),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="conversation cycles of six messages each")
+    parser.add_argument("--window", type=int, default=6, help="messages kept verbatim")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.window))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Websocket events and CPU per streamed response, token by token versus coalesced.
+
+Many responses are streamed concurrently at a model-like token rate into a stand-in for
+cl.Message whose stream_token encodes and queues a Socket.IO event per call, so the CPU
+measured is roughly what the server spends on streaming. "direct" awaits stream_token for
+every token as the apps used to; "coalesced" goes through StreamCoalescer. The CPU of
+producing the tokens alone (the simulated model stream) is measured first and subtracted,
+so streaming_cpu_ms_per_response is the cost of the sends. The added delay is how long the
+last token of a response waited in the buffer.
+
+USAGE:
+    python src/benchmarks/bench_stream_coalescer.py --responses 200 --tokens 300 --token-delay 0.01
+    python src/benchmarks/bench_stream_coalescer.py --flush-ms 50 --flush-chars 128
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from stream_coalescer import StreamCoalescer
+
+WORDS = "the card was blocked after three failed authentications at an unknown merchant yesterday please".split()
+
+
+class EmittingMessage:
+    """
+    Stands in for cl.Message: accumulates the content and, per stream_token call, encodes
+    an event and hands it to a writer task through a queue, as python-socketio does.
+    """
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.content = ""
+        self.sends = 0
+        self.last_sent = 0.0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._writer = asyncio.ensure_future(self._write())
+
+    async def stream_token(self, token: str) -> None:
+        self.content += token
+        self.sends += 1
+        packet = "42" + json.dumps(["stream_token", {"id": self.id, "token": token, "isSequence": False}])
+        await self._queue.put(packet)
+        self.last_sent = time.perf_counter()
+
+    async def _write(self) -> None:
+        while True:
+            packet = await self._queue.get()
+            if packet is None:
+                return
+            packet.encode()
+
+    async def close(self) -> None:
+        await self._queue.put(None)
+        await self._writer
+
+
+async def response(mode: str, args, rng: random.Random, results: list) -> None:
+    message = EmittingMessage()
+    tokens = [rng.choice(WORDS) + " " for _ in range(args.tokens)]
+    if mode == "produce only":
+        for token in tokens:
+            await asyncio.sleep(args.token_delay)
+            message.content += token
+        last_token = message.last_sent = time.perf_counter()
+    elif mode == "direct":
+        for token in tokens:
+            await asyncio.sleep(args.token_delay)
+            await message.stream_token(token)
+        last_token = time.perf_counter()
+    else:
+        async with StreamCoalescer(message, max_delay=args.flush_ms / 1000, max_chars=args.flush_chars) as stream:
+            for token in tokens:
+                await asyncio.sleep(args.token_delay)
+                await stream.push(token)
+            last_token = time.perf_counter()
+    await message.close()
+    assert message.content == "".join(tokens)
+    results.append((message.sends, max(message.last_sent - last_token, 0.0)))
+
+
+async def run_mode(mode: str, args, baseline_cpu: float = 0.0) -> dict:
+    rng = random.Random(args.seed)
+    results = []
+    cpu, started = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(response(mode, args, rng, results) for _ in range(args.responses)))
+    cpu, elapsed = time.process_time() - cpu, time.perf_counter() - started
+    sends = [sent for sent, _ in results]
+    delays = sorted(delay for _, delay in results)
+    return {
+        "mode": mode,
+        "responses": args.responses,
+        "tokens_per_response": args.tokens,
+        "events_per_response": round(statistics.fmean(sends), 1),
+        "cpu_ms_per_response": round(cpu * 1000 / args.responses, 3),
+        "streaming_cpu_ms_per_response": round(max(cpu - baseline_cpu, 0.0) * 1000 / args.responses, 3),
+        "cpu_s": cpu,
+        "elapsed_s": round(elapsed, 3),
+        "added_delay_p50_ms": round(delays[len(delays) // 2] * 1000, 2),
+        "added_delay_max_ms": round(delays[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=200, help="responses streamed concurrently")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per response")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="time between tokens from the model (s)")
+    parser.add_argument("--flush-ms", type=float, default=30)
+    parser.add_argument("--flush-chars", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    baseline_cpu = asyncio.run(run_mode("produce only", args))["cpu_s"]
+    for mode in ("direct", "coalesced"):
+        result = asyncio.run(run_mode(mode, args, baseline_cpu))
+        del result["cpu_s"]
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Model calls the transcript pre-filter saves, and how often it agrees with the model.
+
+The labels are the output of a triage run that sent every transcript to the model
+(--no-prefilter). For each threshold, every labeled transcript is put through the local
+pre-stage: one it skips is answered "not blocked", one it keeps gets the model's label, so
+the agreement rate is the share of verdicts the pre-filter leaves unchanged and
+missed_blocked counts the blocked cards it would have hidden from the model.
+
+USAGE:
+    python src/batch/triage_transcripts.py resources/transcripts --out labels.jsonl --no-prefilter
+    python src/benchmarks/bench_transcript_prefilter.py resources/transcripts --labels labels.jsonl --thresholds 1 2 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "batch"))
+from transcript_prefilter import DEFAULT_THRESHOLD, prefilter
+from triage_transcripts import read_checkpoint, read_transcripts
+
+
+def read_labels(path: str) -> dict[str, dict]:
+    """The model's verdict per transcript id, from a triage output file."""
+    labeled = read_checkpoint(path)
+    labels = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("id") in labeled and entry.get("source", "model") == "model" and entry.get("card_blocked") is not None:
+                labels[entry["id"]] = entry
+    return labels
+
+
+def evaluate(transcripts: list[dict], labels: dict[str, dict], threshold: int) -> dict:
+    skipped = missed = agreed = 0
+    started = time.perf_counter()
+    for item in transcripts:
+        label = labels[item["id"]]
+        keep = prefilter(item, threshold)["needs_model"]
+        skipped += not keep
+        missed += not keep and label["card_blocked"]
+        agreed += keep or not label["card_blocked"]
+    elapsed = time.perf_counter() - started
+    total = len(transcripts)
+    return {
+        "threshold": threshold,
+        "labeled": total,
+        "model_calls_skipped": skipped,
+        "skip_rate": round(skipped / total, 4) if total else 0.0,
+        "agreement_rate": round(agreed / total, 4) if total else 0.0,
+        "missed_blocked": missed,
+        "prefilter_us_per_transcript": round(elapsed * 1e6 / total, 2) if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of .txt transcripts or a JSONL file")
+    parser.add_argument("--labels", required=True, help="triage output made with --no-prefilter")
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[DEFAULT_THRESHOLD])
+    args = parser.parse_args()
+
+    labels = read_labels(args.labels)
+    transcripts = [item for item in read_transcripts(args.source) if item["id"] in labels]
+    for threshold in args.thresholds:
+        print(json.dumps(evaluate(transcripts, labels, threshold)))
+
+
+if __name__ == "__main__":
+    main()
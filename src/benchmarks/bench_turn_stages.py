@@ -0,0 +1,355 @@
+"""
+End-to-end turn latency of every chat, split into stages.
+
+Each scenario runs complete conversations against the rule-based LocalChatCompletion
+(CHAT_COMPLETION_BACKEND=local, see load_chainlit.py) and times every turn, one user message
+until the reply (or the group chat's last agent message). The wall time of a turn is split
+into the time spent in:
+
+    selection         SelectionStrategy.next, including the model call of a prompt strategy
+    agent_completion  the agents' chat completion requests, excluding the tools they call
+    tool              kernel functions called by the model, excluding their database time
+    db                ConnectionPool.lease, i.e. waiting for a connection and the query itself
+    termination       TerminationStrategy.should_terminate, including its model call
+    other             everything else: history handling, Chainlit messages, the event loop and
+                      the group chat's channel synchronization (its BroadcastQueue polls every
+                      100 ms while an agent's history is still being delivered)
+
+Stages are timed exclusively (a tool's database time is only counted as db), so they add up
+to the wall time, except when tool calls run concurrently. For streaming agents the time the
+consumer spends between chunks counts as agent completion.
+
+Scenarios:
+
+    app                         src/chainlit/app.py, the single-agent SQL chat
+    app_multiagent              src/chainlit/app_multiagent.py, the two-agent triage chat
+    app_blocked_card            src/chainlit/app_blocked_card.py, the same with the card tools
+    forgot_pin                  src/demos/ForgotPinAgentChat.py, three agents in turn
+    kernel_function_strategies  src/demos/KernelFunctionStrategies.py, prompt-based strategies
+
+Tools that need PostgreSQL return their usual error JSON when no database is reachable, point
+DB_* at a database with the demo rows to include real queries. One JSON line per scenario is
+printed; --out writes the whole report, and --baseline compares it with an earlier one.
+
+USAGE:
+    python src/benchmarks/bench_turn_stages.py --out turn_stages.json
+    python src/benchmarks/bench_turn_stages.py --scenario app_blocked_card --conversations 50 --latency 0.2
+    python src/benchmarks/bench_turn_stages.py --out new.json --baseline turn_stages.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_chainlit import load_app
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STAGES = ["selection", "agent_completion", "tool", "db", "termination", "other"]
+# Model calls made by a strategy are part of the strategy's stage
+_ABSORBING = {"selection", "termination"}
+
+SCENARIOS = {
+    "app": ("chainlit", "chainlit/app.py", ["What is the balance of account 1?", "And of account 2?"]),
+    "app_multiagent": ("chainlit", "chainlit/app_multiagent.py", ["My card is blocked, my customer ID is 123456"]),
+    "app_blocked_card": ("chainlit", "chainlit/app_blocked_card.py", ["My card is blocked, my customer ID is 123456"]),
+    # Sequential selection: one message per agent
+    "forgot_pin": (
+        "group_chat",
+        "demos/ForgotPinAgentChat.py",
+        ["I forgot the pin of my credit card", "My customer id is 123456", "Please draft the note"],
+    ),
+    "kernel_function_strategies": ("group_chat", "demos/KernelFunctionStrategies.py", ["a slogan for a new line of electric cars."]),
+}
+
+
+@dataclass
+class TurnTimings:
+    seconds: dict = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    calls: dict = field(default_factory=lambda: dict.fromkeys(STAGES[:-1], 0))
+
+
+@dataclass
+class _Frame:
+    stage: str
+    started: float
+    children: float = 0.0
+
+
+_turn: ContextVar[TurnTimings | None] = ContextVar("turn", default=None)
+_frame: ContextVar[_Frame | None] = ContextVar("frame", default=None)
+
+
+def _enter(stage: str):
+    turn = _turn.get()
+    if turn is None:
+        return None
+    parent = _frame.get()
+    if parent is not None and parent.stage in _ABSORBING:
+        stage = parent.stage
+    else:
+        turn.calls[stage] += 1
+    frame = _Frame(stage, time.perf_counter())
+    return turn, parent, frame, _frame.set(frame)
+
+
+def _exit(state) -> None:
+    turn, parent, frame, token = state
+    elapsed = time.perf_counter() - frame.started
+    try:
+        _frame.reset(token)
+    except ValueError:
+        # An abandoned stream closed from another context
+        pass
+    turn.seconds[frame.stage] += max(elapsed - frame.children, 0.0)
+    if parent is not None:
+        parent.children += elapsed
+
+
+def _timed(stage: str, function):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        state = _enter(stage)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            if state is not None:
+                _exit(state)
+
+    return wrapper
+
+
+def _timed_stream(stage: str, function):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        state = _enter(stage)
+        try:
+            async for item in function(*args, **kwargs):
+                yield item
+        finally:
+            if state is not None:
+                _exit(state)
+
+    return wrapper
+
+
+def _timed_context(stage: str, function):
+    @asynccontextmanager
+    async def wrapper(*args, **kwargs):
+        state = _enter(stage)
+        try:
+            async with function(*args, **kwargs) as value:
+                yield value
+        finally:
+            if state is not None:
+                _exit(state)
+
+    return wrapper
+
+
+def instrument() -> None:
+    """Wraps the methods behind each stage; they are only timed inside a measured turn."""
+    from semantic_kernel import Kernel
+    from semantic_kernel.agents.strategies.selection.selection_strategy import SelectionStrategy
+    from semantic_kernel.agents.strategies.termination.termination_strategy import TerminationStrategy
+    from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+
+    sys.path.append(os.path.join(SRC, "chainlit"))
+    from database_connector import ConnectionPool
+
+    SelectionStrategy.next = _timed("selection", SelectionStrategy.next)
+    TerminationStrategy.should_terminate = _timed("termination", TerminationStrategy.should_terminate)
+    ChatCompletionClientBase.get_chat_message_contents = _timed(
+        "agent_completion", ChatCompletionClientBase.get_chat_message_contents
+    )
+    ChatCompletionClientBase.get_streaming_chat_message_contents = _timed_stream(
+        "agent_completion", ChatCompletionClientBase.get_streaming_chat_message_contents
+    )
+    Kernel.invoke_function_call = _timed("tool", Kernel.invoke_function_call)
+    ConnectionPool.lease = _timed_context("db", ConnectionPool.lease)
+
+
+async def measure(turn, records: list) -> None:
+    """Awaits ``turn()`` and appends its TurnTimings (with the wall time) to ``records``."""
+    timings = TurnTimings()
+    token = _turn.set(timings)
+    started = time.perf_counter()
+    try:
+        await turn()
+    finally:
+        wall = time.perf_counter() - started
+        _turn.reset(token)
+        timings.seconds["other"] = max(wall - sum(timings.seconds.values()), 0.0)
+        records.append({"wall": wall, **timings.seconds, "calls": timings.calls})
+
+
+async def chainlit_conversation(module, messages: list, records: list) -> None:
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    init_http_context()
+    await module.on_chat_start()
+    for text in messages:
+        await measure(lambda: module.on_message(cl.Message(content=text)), records)
+
+
+async def group_chat_conversation(module, messages: list, records: list) -> None:
+    from semantic_kernel.contents import ChatMessageContent
+    from semantic_kernel.contents.utils.author_role import AuthorRole
+
+    chat = module.create_group_chat()
+    for text in messages:
+
+        async def turn():
+            # The demos stop after each turn's termination, the next message starts a new round
+            chat.is_complete = False
+            await chat.add_chat_message(ChatMessageContent(role=AuthorRole.USER, content=text))
+            async for _ in chat.invoke():
+                pass
+
+        await measure(turn, records)
+
+
+def _percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def summarize(records: list) -> dict:
+    stages = {}
+    for stage in ["wall"] + STAGES:
+        values = [record[stage] for record in records]
+        stages[stage] = {
+            "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+        }
+    wall = sum(record["wall"] for record in records)
+    for stage in STAGES:
+        stages[stage]["share"] = round(sum(record[stage] for record in records) / wall, 4) if wall else 0.0
+    calls = {stage: round(statistics.fmean(record["calls"][stage] for record in records), 2) for stage in STAGES[:-1]}
+    return {"stages": stages, "calls_per_turn": calls}
+
+
+async def run_scenario(name: str, args) -> dict:
+    import service_registry
+
+    kind, path, default_messages = SCENARIOS[name]
+    module = load_app(os.path.join(SRC, path))
+    messages = args.message or default_messages
+    conversation = chainlit_conversation if kind == "chainlit" else group_chat_conversation
+
+    records, errors = [], []
+    for _ in range(args.conversations):
+        try:
+            await conversation(module, messages, records)
+        except Exception as e:
+            errors.append(repr(e))
+    # The apps register kernels under the same names, start every scenario from scratch
+    await service_registry.close()
+
+    result = {"scenario": name, "turns": len(records), "errors": len(errors), "first_error": errors[0] if errors else None}
+    if records:
+        result.update(summarize(records))
+    if args.per_turn:
+        result["records"] = records
+    return result
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Mean time per stage of each scenario against ``baseline``, as a relative change."""
+    deltas = {}
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "stages" not in before or "stages" not in result:
+            continue
+        deltas[name] = {}
+        for stage, values in result["stages"].items():
+            old, new = before["stages"].get(stage, {}).get("mean_ms"), values["mean_ms"]
+            if old is None:
+                continue
+            change = round((new - old) / old, 4) if old else None
+            deltas[name][stage] = {"baseline_ms": old, "current_ms": new, "change": change}
+    return deltas
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    instrument()
+    report = {
+        "version": {"git": _git_revision(), "python": platform.python_version()},
+        "settings": {
+            "conversations": args.conversations,
+            "latency_s": args.latency,
+            "token_delay_s": args.token_delay,
+            "cache": args.cache,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        report["scenarios"][name] = await run_scenario(name, args)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="repeat for several, default all")
+    parser.add_argument("--conversations", type=int, default=20, help="conversations per scenario, run one after another")
+    parser.add_argument("--message", action="append", help="user message to send instead of the scenario's own")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated model latency per response (s)")
+    parser.add_argument("--token-delay", type=float, default=0.001, help="simulated delay between streamed tokens (s)")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache in front of the stand-in")
+    parser.add_argument("--per-turn", action="store_true", help="include every turn's timings in the report")
+    parser.add_argument("--out", help="write the report as JSON to this file")
+    parser.add_argument("--baseline", help="an earlier report to compare the mean stage times with")
+    args = parser.parse_args()
+
+    os.environ["CHAT_COMPLETION_BACKEND"] = "local"
+    os.environ["CHAT_LOCAL_LATENCY"] = str(args.latency)
+    os.environ["CHAT_LOCAL_TOKEN_DELAY"] = str(args.token_delay)
+    if not args.cache:
+        os.environ["CHAT_CACHE_TTL"] = "0"
+    os.environ.setdefault("CHAINLIT_APP_ROOT", tempfile.mkdtemp(prefix="chainlit-bench-"))
+
+    # The apps print every message, keep stdout for the results
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    logging.disable(logging.INFO)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        sys.stdout = stdout
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            report["baseline"] = compare(report, json.load(file))
+    for result in report["scenarios"].values():
+        print(json.dumps({key: value for key, value in result.items() if key != "records"}))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if "baseline" in report:
+        print(json.dumps({"baseline": report["baseline"]}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Load driver for the Chainlit apps against the local chat completion stand-in.
+
+Runs many simulated conversations concurrently through the app's real on_chat_start and
+on_message handlers, each in its own Chainlit HTTP context (so cl.user_session and
+cl.Message behave as for a browser session), with every chat service replaced by the
+rule-based LocalChatCompletion (CHAT_COMPLETION_BACKEND=local). What is measured is
+therefore our own orchestration overhead: agents, group chat strategies, plugins and
+handlers, plus the simulated model latency.
+
+Tools that need PostgreSQL return their usual error JSON when no database is reachable;
+the conversations still complete, but point DB_* at a database with the demo rows to
+include the queries in the numbers.
+
+USAGE:
+    python src/benchmarks/load_chainlit.py --app src/chainlit/app_blocked_card.py --conversations 300 --concurrency 100
+    python src/benchmarks/load_chainlit.py --app src/evaluation/app_simple_weather_agent.py --latency 0.2 --token-delay 0.005
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DEFAULT_MESSAGES = {
+    # The group chats terminate once the analysis is approved, so one message per conversation
+    "app_blocked_card": ["My card is blocked, my customer ID is 123456"],
+    "app_multiagent": ["My card is blocked, my customer ID is 123456"],
+    "app": ["What is the balance of account 1?"],
+    "app_simple_weather_agent": ["What is the weather in Paris?", "And the weather in Tokyo?"],
+}
+
+
+def _percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def _summary(values: list) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(values) * 1000, 1),
+    }
+
+
+def load_app(path: str):
+    """Imports the Chainlit app at ``path`` the way `chainlit run` does, its directory first on sys.path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    sys.path.insert(0, directory)
+    # The apps import modules shared from src/chainlit
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def conversation(app, messages: list, start_latencies: list, turn_latencies: list, errors: list) -> None:
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    init_http_context()
+    try:
+        started = time.perf_counter()
+        await app.on_chat_start()
+        start_latencies.append(time.perf_counter() - started)
+        for text in messages:
+            started = time.perf_counter()
+            await app.on_message(cl.Message(content=text))
+            turn_latencies.append(time.perf_counter() - started)
+    except Exception as e:
+        errors.append(repr(e))
+
+
+async def run(args) -> dict:
+    app = load_app(args.app)
+    name = os.path.splitext(os.path.basename(args.app))[0]
+    messages = args.message or DEFAULT_MESSAGES.get(name, ["Hello"])
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    start_latencies, turn_latencies, errors = [], [], []
+
+    async def limited():
+        async with semaphore:
+            await conversation(app, messages, start_latencies, turn_latencies, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(args.conversations)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "app": name,
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "messages_per_conversation": len(messages),
+        "latency_s": args.latency,
+        "token_delay_s": args.token_delay,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(turn_latencies) / elapsed, 2),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "chat_start": _summary(start_latencies),
+        "turn": _summary(turn_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=os.path.join("src", "chainlit", "app_blocked_card.py"))
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--message", action="append", help="user message to send, repeat for several turns")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated model latency per response (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="simulated delay between streamed tokens (s)")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache in front of the stand-in")
+    parser.add_argument("--quiet", action="store_true", help="silence the apps' prints and info logs")
+    args = parser.parse_args()
+
+    # Must be in place before the app module builds its agents
+    os.environ["CHAT_COMPLETION_BACKEND"] = "local"
+    os.environ["CHAT_LOCAL_LATENCY"] = str(args.latency)
+    os.environ["CHAT_LOCAL_TOKEN_DELAY"] = str(args.token_delay)
+    if not args.cache:
+        os.environ["CHAT_CACHE_TTL"] = "0"
+    # Keep Chainlit's generated config and translation files out of the source tree
+    os.environ.setdefault("CHAINLIT_APP_ROOT", tempfile.mkdtemp(prefix="chainlit-load-"))
+
+    stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+        logging.disable(logging.INFO)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
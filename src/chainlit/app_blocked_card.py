@@ -13,12 +13,26 @@ from semantic_kernel.agents.strategies import TerminationStrategy, KernelFunctio
 from semantic_kernel.functions import KernelFunctionFromPrompt
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
-import os, json, logging, psycopg2
-from psycopg2.extras import RealDictCursor
+import os, json, logging
 
 from typing import Annotated
 
+from blocked_card_plugin import BlockedCardPlugin
+from database_connector import get_pool, session_limit
+from group_chat_strategies import (
+    LayeredTerminationStrategy,
+    StateMachineSelectionStrategy,
+    approval_check,
+    triage_transitions,
+)
+from history_window import RollingSummaryReducer
+from service_registry import get_chat_service
+from structured_logging import setup_logging
+from tracing import add_tracing_filter, traced, traced_invoke
+
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 # Disable verbose connection logs
 #logger = logging.getLogger("azure.core.pipeline.policies.http_logging_policy")
 #logger.setLevel(logging.ERROR)
@@ -27,74 +41,6 @@ load_dotenv()
 #     function_choice_behavior=FunctionChoiceBehavior.Auto(filters={"excluded_plugins": ["ChatBot"]})
 # )
 
-from decimal import Decimal
-
-class DatabaseConnector:
-    def __init__(self):
-        self.create_connection()
-
-    @kernel_function(description="Create a connection object to the postgres database.")
-    def create_connection(self):
-        print("create_connection function called... ")
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        self.connection = connection
-        self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
-
-    @kernel_function(description="Fetches data based on the query provided.")
-    def query_database(self, query: Annotated[str, "query to be executed"]) -> Annotated[str, "Returns the queried information as a json"]:
-        """
-        Fetches the information from the required table in PostgreSQL database.
-
-        :param query (str): the query to be executed.
-        :return: fetched information as a JSON string.
-        :rtype: str
-        """
-        print("query_database function called... query: ", query)
-        try:
-            # if(self.connection != True):
-            #     self.create_connection()
-            
-            #connection = self.connection
-            cursor = self.cursor
-            cursor.execute(query=query)
-            result_record = cursor.fetchone()
-            if result_record:
-                # Convert Decimal values to strings
-                for key, value in result_record.items():
-                    if isinstance(value, Decimal):
-                        result_record[key] = str(value)
-                return json.dumps({"result_record": result_record})
-            else:
-                return json.dumps({"error": "An error occured while fetching the data."})
-        except Exception as e:
-            return json.dumps({"error": str(e)})
-        # finally:
-        #     if connection:
-        #         self.close_connection()
-        
-    
-    @kernel_function(description="Closes the connection to the database.")
-    def close_connection(self) -> Annotated[str, "Returns a message indicating the status of the connection closure."]:
-        """
-        Closes the connection to the PostgreSQL database.
-
-        :return: Message indicating the status of the connection closure.
-        :rtype: str
-        """
-        print("close_connection function called... ")
-        try:
-            if self.connection:
-                self.cursor.close()
-                self.connection.close()
-            return "Connection closed successfully."
-        except Exception as e:
-            return str(e)
 
 class ApprovalTerminationStrategy(TerminationStrategy):
     """A strategy for determining when an agent should terminate."""
@@ -105,40 +51,30 @@ class ApprovalTerminationStrategy(TerminationStrategy):
     
 def _create_kernel_with_chat_completion(service_id: str) -> Kernel:
     kernel = Kernel()
-    kernel.add_service(
-        AzureChatCompletion(service_id=service_id, 
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        ))
+    kernel.add_service(get_chat_service(service_id))
+    add_tracing_filter(kernel)
     return kernel
 
-def _create_kernel_with_chat_completion_and_plugin(service_id: str) -> Kernel:
+def _create_kernel_with_chat_completion_and_plugin(service_id: str, cacheable: bool = True) -> Kernel:
     kernel = Kernel()
-    kernel.add_service(AzureChatCompletion(service_id=service_id, 
-                                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                                        deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                                        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-                                        ))
+    kernel.add_service(get_chat_service(service_id, cacheable))
+    add_tracing_filter(kernel)
 
-    kernel.add_plugin(DatabaseConnector(), plugin_name="db_connector")
+    kernel.add_plugin(BlockedCardPlugin(), plugin_name="blocked_card")
     return kernel
 
 
 ANALYST_NAME = "BusinessAnalyst"
 ANALYST_INSTRUCTIONS = """
-You are a highly skilled business analyst with extensive experience in writing and executing SQL queries. Fix errors in the SQL queries and ensure they are correct.
-Do not make any assumptions about query results. You need to execute necessary SQL queries to determine the reason for a blocked card.
-You have access to a PostgreSQL database that contains information about customers and their credit card transactions.
-The database contains information about customers in the table customerdata and their credit card transactions in the table credit_card_transactions.
-The table customerdata has the following columns: customer_id: , card_blocked, payment_due, card_type and credit_card_no.
-The table credit_card_transactions has the following columns: credit_card_no, date, amount, authentication_passed and location.
-
-You have been provided with a customer id by the Orchestrator and you need to query the database to determine the reason for the blocked card.
-You need to check the card_blocked column in the customerdata table to determine if the card is blocked. 
-If so, you need to check the credit_card_transactions table to determine if the card is blocked due to more than 3 authentication failures. 
-If there were more than 3 authentication failures recently, the card is blocked because of that. 
-If not, the card is blocked due to some other reason. 
+You are a highly skilled business analyst who determines the reason for a blocked card.
+Do not make any assumptions about the results. Use your tools to look up the customer and their credit card transactions.
+
+You have been provided with a customer id by the Orchestrator and you need to determine the reason for the blocked card.
+First call get_customer_card_status with the customer id to determine if the card is blocked.
+If so, call count_recent_auth_failures with the credit_card_no returned by get_customer_card_status.
+If there were more than 3 authentication failures recently (blocked_due_to_authentication_failures is true), the card is blocked because of that.
+If not, the card is blocked due to some other reason.
+Do not call any tool more than once for the same customer.
 You need to provide the reason (authentication failure or unknown reason) to the Orchestrator.
 Respond to the other agents with their names -- like @TriageAgent -- when you interact with them.
 """
@@ -161,6 +97,9 @@ If the reason for card blocking is unknown, explain in the email that you will g
 After you have drafted the email, you MUST approve the analysis by using keywords such as "approved" or "not approved". 
 """
 
+# Messages the selection and termination prompts see verbatim, older ones are summarized
+STRATEGY_HISTORY_WINDOW = int(os.getenv("STRATEGY_HISTORY_WINDOW", "6"))
+
 TASK = "Determine the reason for blocked card"
 
 # 4. Create a Kernel Function to determine which agent should take the next turn
@@ -209,11 +148,13 @@ analyst_kernel = _create_kernel_with_chat_completion_and_plugin("business_analys
 filter.add_to_kernel(analyst_kernel)
 settings = analyst_kernel.get_prompt_execution_settings_from_service_id(service_id="business_analyst")
 settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
+# Tool calls of one response run concurrently, each lookup on its own pooled connection
+settings.parallel_tool_calls = True
 agent_analyst = ChatCompletionAgent(
     kernel=analyst_kernel,
     name=ANALYST_NAME,
     instructions=ANALYST_INSTRUCTIONS,
-    
+    arguments=KernelArguments(settings=settings),
 )
 
 # 3. Create the reviewer agent based on the chat completion service
@@ -239,21 +180,25 @@ async def on_chat_start():
             
         ],
         chat_history=chat_history,
-        termination_strategy=KernelFunctionTerminationStrategy(
+        termination_strategy=LayeredTerminationStrategy(
+            precheck=approval_check(ORCHESTRATOR_NAME),
             agents=[agent_orchestrator],
             function=termination_function,
-            kernel=_create_kernel_with_chat_completion_and_plugin("termination"),
+            kernel=_create_kernel_with_chat_completion_and_plugin("termination", cacheable=False),
             result_parser=lambda result: str(result.value[0]).lower() == "yes",
             history_variable_name="history",
+            history_reducer=RollingSummaryReducer(target_count=STRATEGY_HISTORY_WINDOW),
             maximum_iterations=10,
         ),
-        selection_strategy=KernelFunctionSelectionStrategy(
+        selection_strategy=StateMachineSelectionStrategy(
+            transitions=triage_transitions(ORCHESTRATOR_NAME, ANALYST_NAME),
             function=selection_function,
-            kernel=_create_kernel_with_chat_completion_and_plugin("selection"),
+            kernel=_create_kernel_with_chat_completion_and_plugin("selection", cacheable=False),
             initial_agent=agent_orchestrator,
             result_parser=lambda result: str(result.value[0]) if result.value is not None else ANALYST_NAME,
             agent_variable_name="agents",
             history_variable_name="history",
+            history_reducer=RollingSummaryReducer(target_count=STRATEGY_HISTORY_WINDOW),
         )
     )
 
@@ -265,8 +210,10 @@ async def on_chat_start():
     #cl.user_session.set("current_agent", agent_orchestrator)
     cl.user_session.set("chat_history", chat_history)
     cl.user_session.set("group_chat", group_chat)
+    cl.user_session.set("db_session_limit", session_limit())
 
 @cl.on_message
+@traced("chainlit.on_message")
 async def on_message(message: cl.Message):
     group_chat = cl.user_session.get("group_chat")
     chat_history = cl.user_session.get("chat_history")
@@ -276,15 +223,22 @@ async def on_message(message: cl.Message):
     chat_history.add_user_message(message.content)
     # Create a Chainlit message for the response stream
     #answer = cl.Message(content="")
-    async for msg in group_chat.invoke():
-        
-        #if str(msg.content):
-            #await answer.stream_token(msg.content)
-        
-        print(f"# {msg.name}: {msg.content}", end="")
-        await cl.Message(
-            content=f"{msg.name}: {msg.content}", author=msg.name
-        ).send()
-
-        chat_history.add_assistant_message(msg.content)
+    # Every agent turn leases at most one pooled connection, returned when the turn ends
+    async with get_pool().turn(cl.user_session.get("db_session_limit")) as lease:
+        async for msg in traced_invoke(group_chat):
+            await lease.release()
+
+            #if str(msg.content):
+                #await answer.stream_token(msg.content)
+
+            logger.info("agent message", extra={"agent": msg.name, "chars": len(str(msg.content))})
+            logger.debug("agent message content", extra={"agent": msg.name, "content": str(msg.content)})
+            await cl.Message(
+                content=f"{msg.name}: {msg.content}", author=msg.name
+            ).send()
+
+    logger.info(
+        "strategy stats",
+        extra={"selection": group_chat.selection_strategy.stats(), "termination": group_chat.termination_strategy.stats()},
+    )
 
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import weakref
+from typing import Annotated
+
+import psycopg2.errors
+from semantic_kernel.functions import kernel_function
+
+from database_connector import ConnectionPool, get_pool
+from query_cache import QueryCache, get_query_cache, normalize_query
+from result_encoder import ResultEncoder
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Server-side prepared statements, created once per pooled connection
+STATEMENTS = {
+    "blocked_card_customer_status": (
+        "(integer)",
+        """
+        SELECT customer_id, card_blocked, payment_due, card_type, credit_card_no
+        FROM customerdata
+        WHERE customer_id = $1
+        """,
+    ),
+    "blocked_card_auth_failures": (
+        "(bigint, integer)",
+        """
+        SELECT count(*)::integer AS failed_authentications, max(date) AS last_failure
+        FROM credit_card_transactions
+        WHERE credit_card_no = $1
+          AND authentication_passed = FALSE
+          AND date >= NOW() - make_interval(days => $2)
+        """,
+    ),
+}
+
+AUTH_FAILURE_LIMIT = 3
+# Default look-back of count_recent_auth_failures, in days
+AUTH_FAILURE_WINDOW_DAYS = int(os.getenv("BLOCKED_CARD_AUTH_WINDOW_DAYS", "30"))
+
+
+# Names of the statements prepared on each pooled connection, forgotten with the connection
+# once the pool closes or replaces it
+_prepared: "weakref.WeakKeyDictionary[object, set[str]]" = weakref.WeakKeyDictionary()
+
+
+def _prepare(cursor, name: str) -> None:
+    argument_types, statement = STATEMENTS[name]
+    cursor.execute(f"PREPARE {name} {argument_types} AS {statement}")
+
+
+def _execute_prepared(connection, name: str, params: tuple):
+    """Runs the prepared statement ``name``, preparing it first on connections that lack it."""
+    prepared = _prepared.setdefault(connection, set())
+    execute = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+    with connection.cursor() as cursor:
+        try:
+            if name not in prepared:
+                try:
+                    _prepare(cursor, name)
+                except psycopg2.errors.DuplicatePreparedStatement:
+                    connection.rollback()
+                prepared.add(name)
+            try:
+                cursor.execute(execute, params)
+            except psycopg2.errors.InvalidSqlStatementName:
+                # Dropped on the server (DISCARD ALL, a pooler in between), prepare again
+                connection.rollback()
+                _prepare(cursor, name)
+                cursor.execute(execute, params)
+            row = cursor.fetchone()
+            columns = cursor.description
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return row, columns
+
+
+class BlockedCardPlugin:
+    """
+    Typed lookups for the blocked card diagnosis. The analyst calls
+    get_customer_card_status and, for a blocked card, count_recent_auth_failures,
+    instead of writing SQL against the schema.
+    """
+
+    def __init__(self, pool: ConnectionPool | None = None, cache: QueryCache | None = None):
+        self.pool = pool or get_pool()
+        self.cache = cache if cache is not None else get_query_cache()
+
+    async def _lookup(self, name: str, params: tuple, cacheable: bool = True):
+        normalized = normalize_query(STATEMENTS[name][1])
+        # The parameters are customer data, only the statement is recorded
+        with span("db.query", {"db.system": "postgresql", "db.query.text": STATEMENTS[name][1], "db.statement.name": name}) as current:
+            cached = self.cache.get(normalized, *params) if cacheable else None
+            current.set_attribute("db.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+            async with self.pool.lease() as connection:
+                row, columns = await asyncio.to_thread(_execute_prepared, connection, name, params)
+            current.set_attribute("db.response.returned_rows", 1 if row else 0)
+        record = ResultEncoder(columns).record(row) if row else None
+        if cacheable:
+            self.cache.put(normalized, record, *params)
+        return record
+
+    @kernel_function(description="Gets whether the card of a customer is blocked, along with the card number, card type and payment due flag.")
+    async def get_customer_card_status(
+        self, customer_id: Annotated[int, "customer id provided by the user"]
+    ) -> Annotated[str, "Returns the card status of the customer as a json"]:
+        """
+        Fetches the card status of a customer from the customerdata table.
+
+        :param customer_id (int): ID of the customer.
+        :return: card status as a JSON string.
+        :rtype: str
+        """
+        logger.info("get_customer_card_status called")
+        try:
+            record = await self._lookup("blocked_card_customer_status", (int(customer_id),))
+            if record is None:
+                return json.dumps({"error": f"No customer found with customer_id {customer_id}."})
+            return json.dumps(record)
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    @kernel_function(description="Counts the failed authentications of a credit card in the last days and tells whether they explain the block.")
+    async def count_recent_auth_failures(
+        self,
+        card_no: Annotated[str, "credit_card_no as returned by get_customer_card_status"],
+        window: Annotated[int, "number of days to look back"] = AUTH_FAILURE_WINDOW_DAYS,
+    ) -> Annotated[str, "Returns the number of failed authentications as a json"]:
+        """
+        Counts failed authentications of a credit card in the credit_card_transactions table.
+        The count is read from the database on every call, never from the query cache: it
+        changes with failures recorded by other writers and as the window moves, and it
+        decides whether the card may be unblocked.
+        Only transactions dated within ``window`` days of now count: the demo rows of
+        resources/setup/setup_db.sql have fixed dates and fall out of the default window as
+        they age, so raise BLOCKED_CARD_AUTH_WINDOW_DAYS to diagnose against them.
+
+        :param card_no (str): credit card number.
+        :param window (int): number of days to look back, BLOCKED_CARD_AUTH_WINDOW_DAYS (30) by default.
+        :return: failure count, last failure and whether the card is blocked because of them as a JSON string.
+        :rtype: str
+        """
+        logger.info("count_recent_auth_failures called", extra={"window": window})
+        try:
+            card_number = int(str(card_no).replace(" ", "").replace("-", ""))
+            record = await self._lookup("blocked_card_auth_failures", (card_number, int(window)), cacheable=False)
+            failures = record["failed_authentications"] if record else 0
+            return json.dumps(
+                {
+                    "credit_card_no": str(card_number),
+                    "window_days": int(window),
+                    "failed_authentications": failures,
+                    "last_failure": record["last_failure"] if record else None,
+                    "blocked_due_to_authentication_failures": failures > AUTH_FAILURE_LIMIT,
+                }
+            )
+        except Exception as e:
+            return json.dumps({"error": str(e)})
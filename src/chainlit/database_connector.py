@@ -0,0 +1,529 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Annotated
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from semantic_kernel.functions import kernel_function
+
+from query_cache import QueryCache, get_query_cache, is_write, normalize_query, referenced_tables
+from result_encoder import LAYOUTS, ResultEncoder
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be leased from the pool in time."""
+
+
+class TurnLease:
+    """
+    One pooled connection for every query of a group chat turn.
+
+    The connection is only acquired when the turn runs its first query, so turns that
+    never touch the database do not hold one, and :meth:`release` hands it back when the
+    turn is over. ``limit`` is the semaphore of the session: it caps how many connections
+    the turns of one session may hold at the same time.
+
+    Semantic Kernel runs the tool calls of one model response concurrently. With
+    ``parallel``, a query issued while the turn's connection is busy gets a pooled
+    connection of its own for its duration, as long as ``limit`` has room; otherwise it
+    waits for the turn's connection.
+    """
+
+    def __init__(self, pool: "ConnectionPool", limit: asyncio.Semaphore | None = None, parallel: bool = True):
+        self.pool = pool
+        self.limit = limit
+        self.parallel = parallel
+        self.connection = None
+        self.concurrent_queries = 0
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def connection_for_query(self):
+        if self.parallel and self._lock.locked() and (self.limit is None or not self.limit.locked()):
+            async with self._concurrent_connection() as connection:
+                yield connection
+            return
+        # Queries of one turn run one at a time on the turn's connection
+        async with self._lock:
+            if self.connection is None:
+                if self.limit is not None:
+                    await self.limit.acquire()
+                try:
+                    self.connection = await self.pool.acquire()
+                except BaseException:
+                    if self.limit is not None:
+                        self.limit.release()
+                    raise
+            yield self.connection
+
+    @asynccontextmanager
+    async def _concurrent_connection(self):
+        # The limit has room (checked without awaiting since), so this does not wait
+        if self.limit is not None:
+            await self.limit.acquire()
+        try:
+            connection = await self.pool.acquire()
+        except BaseException:
+            if self.limit is not None:
+                self.limit.release()
+            raise
+        self.concurrent_queries += 1
+        try:
+            yield connection
+        finally:
+            try:
+                await self.pool.release(connection)
+            finally:
+                if self.limit is not None:
+                    self.limit.release()
+
+    async def release(self) -> None:
+        """Hands the connection of the turn back to the pool, if the turn acquired one."""
+        async with self._lock:
+            if self.connection is None:
+                return
+            connection, self.connection = self.connection, None
+            try:
+                await self.pool.release(connection)
+            finally:
+                if self.limit is not None:
+                    self.limit.release()
+
+
+# The lease of the group chat turn running in the current task, see ConnectionPool.turn
+_turn_lease: ContextVar[TurnLease | None] = ContextVar("turn_lease", default=None)
+
+
+class ConnectionPool:
+    """
+    An asyncio-friendly pool of psycopg2 connections.
+
+    psycopg2 is a blocking driver, so every statement runs in a worker thread while the
+    event loop keeps serving the other Chainlit sessions. A connection is leased for a
+    single query and handed back afterwards, or for a whole group chat turn inside
+    :meth:`turn`; at most ``max_size`` connections are open at any time and callers wait
+    at most ``acquire_timeout`` seconds for a free one.
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 10, acquire_timeout: float = 10.0, **connect_kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Expected 0 <= min_size <= max_size and max_size >= 1.")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = connect_kwargs
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, **overrides) -> "ConnectionPool":
+        """Builds a pool from the DB_* environment variables used across the project."""
+        settings = dict(
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+        )
+        settings.update(overrides)
+        return cls(**settings)
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    async def open(self) -> None:
+        """Opens connections until the pool holds ``min_size`` of them."""
+        self._closed = False
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                connection = await asyncio.to_thread(self._connect)
+            except Exception:
+                self._size -= 1
+                raise
+            self._idle.append(connection)
+
+    async def acquire(self):
+        """Takes a connection out of the pool, opening a new one if needed."""
+        if self._closed:
+            raise PoolTimeoutError("The connection pool is closed.")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f"No database connection became available within {self.acquire_timeout} seconds."
+            ) from None
+        finally:
+            self._waiting -= 1
+
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                if not connection.closed:
+                    return connection
+                self._size -= 1
+            self._size += 1
+            try:
+                return await asyncio.to_thread(self._connect)
+            except Exception:
+                self._size -= 1
+                raise
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, connection) -> None:
+        """Returns a leased connection, discarding it if it is broken or the pool is closed."""
+        try:
+            if connection.closed:
+                self._size -= 1
+                return
+            if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    await asyncio.to_thread(connection.rollback)
+                except psycopg2.Error:
+                    connection.close()
+                    self._size -= 1
+                    return
+            if self._closed:
+                connection.close()
+                self._size -= 1
+                return
+            self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Leases a connection for the duration of the ``async with`` block. Inside
+        :meth:`turn` this is the connection of the turn, which stays leased afterwards.
+        """
+        turn = _turn_lease.get()
+        if turn is not None and turn.pool is self:
+            async with turn.connection_for_query() as connection:
+                yield connection
+            return
+
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    @asynccontextmanager
+    async def turn(self, limit: asyncio.Semaphore | None = None, parallel: bool = True):
+        """
+        Makes every :meth:`lease` in the ``async with`` block (and in the tasks it starts)
+        share one connection, acquired on the first query. Call ``release()`` on the
+        yielded TurnLease when an agent's turn ends; the connection is handed back at the
+        end of the block in any case.
+
+        :param limit (asyncio.Semaphore): per-session cap on leased connections, see
+            session_limit.
+        :param parallel (bool): let concurrent tool calls lease connections of their own.
+        :return: the lease of the turn.
+        :rtype: TurnLease
+        """
+        lease = TurnLease(self, limit, parallel)
+        token = _turn_lease.set(lease)
+        try:
+            yield lease
+        finally:
+            _turn_lease.reset(token)
+            await lease.release()
+
+    async def close(self) -> None:
+        """Closes the idle connections; leased ones are closed when they are released."""
+        self._closed = True
+        while self._idle:
+            self._idle.pop().close()
+            self._size -= 1
+
+    def stats(self) -> dict:
+        """Returns the current pool occupancy."""
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "waiting": self._waiting,
+            "max_size": self.max_size,
+        }
+
+
+_shared_pool = None
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool shared by every DatabaseConnector and every session."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = ConnectionPool.from_env()
+    return _shared_pool
+
+
+def session_limit() -> asyncio.Semaphore:
+    """
+    The per-session cap for ConnectionPool.turn: how many pooled connections the turns of
+    one chat session may hold at once, DB_SESSION_MAX_CONNECTIONS (default 2, the turn's
+    connection and one for a tool call running next to it).
+    """
+    return asyncio.Semaphore(int(os.getenv("DB_SESSION_MAX_CONNECTIONS", "2")))
+
+
+def _fetch_one(connection, query: str):
+    with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+        try:
+            cursor.execute(query=query)
+            result_record = cursor.fetchone() if cursor.description else None
+            columns = cursor.description
+            rowcount = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return result_record, columns, rowcount
+
+
+def _query_digest(query: str) -> str:
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_continuation_token(query: str, offset: int) -> str:
+    """Encodes the position after the last returned row of ``query``."""
+    payload = json.dumps({"q": _query_digest(query), "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_continuation_token(query: str, token: str) -> int:
+    """Returns the row offset stored in ``token``, checking that it was issued for ``query``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        offset = int(payload["o"])
+    except Exception:
+        raise ValueError("Invalid continuation token.") from None
+    if payload.get("q") != _query_digest(query) or offset < 0:
+        raise ValueError("The continuation token was issued for a different query.")
+    return offset
+
+
+def _fetch_page(connection, query: str, offset: int, page_size: int, max_rows: int, max_bytes: int, layout: str):
+    """
+    Streams rows through a server-side (named) cursor. Rows are pulled ``page_size`` at a
+    time, so at most one page is held in Python memory beyond the rows being returned,
+    and skipping to ``offset`` happens on the server with MOVE. A page that fits the
+    limits is serialized with one encoder call; only the page that crosses one is
+    serialized row by row, to find the last row that fits. The byte budget is measured on
+    the serialized rows.
+
+    Returns the serialized rows (as chunks of comma separated rows, for
+    ResultEncoder.envelope), the number of rows, their encoder, the offset of the next
+    unread row (None when the result set is exhausted) and the limit that stopped the scan.
+    """
+    chunks = []
+    count = 0
+    size = 0
+    stopped_by = None
+    has_more = False
+    encoder = None
+    cursor = connection.cursor(name=f"page_{uuid.uuid4().hex}")
+    try:
+        cursor.itersize = page_size
+        cursor.execute(query=query)
+        if offset:
+            cursor.scroll(offset)
+        while stopped_by is None:
+            page = cursor.fetchmany(page_size)
+            if encoder is None:
+                encoder = ResultEncoder(cursor.description)
+            if not page:
+                break
+            # A page expected (from the rows so far) to cross the byte budget goes row by row
+            # straight away instead of being serialized twice
+            if count + len(page) <= max_rows and not (count and size + size / count * len(page) > max_bytes):
+                chunk = encoder.encode_batch(page, layout)
+                # Without the commas between the rows, as when each row is measured on its own
+                chunk_size = len(chunk) - (len(page) - 1)
+                if size + chunk_size <= max_bytes:
+                    chunks.append(chunk)
+                    count += len(page)
+                    size += chunk_size
+                    if count >= max_rows and len(page) == page_size:
+                        has_more = cursor.fetchone() is not None
+                        stopped_by = "max_rows" if has_more else None
+                        break
+                    continue
+            for encoded_row in encoder.encode_rows(page, layout):
+                row_size = len(encoded_row)
+                if count and size + row_size > max_bytes:
+                    stopped_by = "max_bytes"
+                elif count >= max_rows:
+                    stopped_by = "max_rows"
+                if stopped_by is not None:
+                    has_more = True
+                    break
+                chunks.append(encoded_row)
+                count += 1
+                size += row_size
+            else:
+                if count >= max_rows and len(page) == page_size:
+                    has_more = cursor.fetchone() is not None
+                    stopped_by = "max_rows" if has_more else None
+                    break
+        cursor.close()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    next_offset = offset + count if has_more else None
+    return chunks, count, encoder, next_offset, stopped_by
+
+
+class DatabaseConnector:
+    def __init__(self, pool: ConnectionPool | None = None, cache: QueryCache | None = None):
+        self.pool = pool or get_pool()
+        self.cache = cache if cache is not None else get_query_cache()
+
+    def _invalidate_written_tables(self, normalized: str) -> None:
+        if is_write(normalized):
+            self.cache.invalidate(referenced_tables(normalized))
+
+    @kernel_function(description="Create a connection object to the postgres database.")
+    async def create_connection(self) -> Annotated[str, "Returns a message indicating the status of the connection."]:
+        """
+        Makes sure the shared connection pool is warmed up. Queries lease their own connections,
+        so calling this is optional.
+
+        :return: Message indicating the status of the connection pool.
+        :rtype: str
+        """
+        logger.info("create_connection called")
+        try:
+            await self.pool.open()
+            return "Connection created successfully."
+        except Exception as e:
+            return str(e)
+
+    @kernel_function(description="Fetches data based on the query provided.")
+    async def query_database(self, query: Annotated[str, "query to be executed"]) -> Annotated[str, "Returns the queried information as a json"]:
+        """
+        Fetches the information from the required table in PostgreSQL database.
+        A query that returns rows gives its first row as ``result_record``, which is null
+        when there is none; a statement without a result set (UPDATE, INSERT, ...) gives
+        the number of rows it affected as ``rowcount``. ``error`` is only returned when
+        the statement fails.
+
+        :param query (str): the query to be executed.
+        :return: fetched information as a JSON string.
+        :rtype: str
+        """
+        logger.info("query_database called", extra={"query_digest": _query_digest(query), "query_chars": len(query)})
+        logger.debug("query_database query", extra={"query": query})
+        normalized = normalize_query(query)
+        with span("db.query", {"db.system": "postgresql", "db.query.text": query}) as current:
+            cached = self.cache.get(normalized)
+            current.set_attribute("db.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+            try:
+                async with self.pool.lease() as connection:
+                    result_record, columns, rowcount = await asyncio.to_thread(_fetch_one, connection, query)
+                self._invalidate_written_tables(normalized)
+                if columns is None:
+                    current.set_attribute("db.response.affected_rows", rowcount)
+                    return json.dumps({"rowcount": rowcount})
+                current.set_attribute("db.response.returned_rows", 1 if result_record else 0)
+                record = ResultEncoder(columns).record(result_record) if result_record else None
+                result = json.dumps({"result_record": record})
+                self.cache.put(normalized, result)
+                return result
+            except Exception as e:
+                current.set_attribute("error.type", type(e).__name__)
+                return json.dumps({"error": str(e)})
+
+    @kernel_function(
+        description="Fetches many rows for list or aggregate questions, one page at a time. "
+        "Pass the returned continuation_token back to get the next page."
+    )
+    async def query_database_paged(
+        self,
+        query: Annotated[str, "SELECT query to be executed"],
+        continuation_token: Annotated[str, "continuation_token returned by the previous page, empty for the first page"] = "",
+        page_size: Annotated[int, "number of rows read from the server per round trip"] = 50,
+        max_rows: Annotated[int, "maximum number of rows to return in this page"] = 100,
+        max_bytes: Annotated[int, "maximum size of the returned rows in bytes (roughly 4 bytes per token)"] = 8000,
+        layout: Annotated[str, "'columnar' lists the column names once followed by value arrays, 'records' returns one object per row"] = "columnar",
+    ) -> Annotated[str, "Returns the rows as a json with a continuation_token when more rows are available"]:
+        """
+        Fetches a page of rows from the PostgreSQL database using a server-side cursor.
+
+        :param query (str): the SELECT query to be executed.
+        :param continuation_token (str): token from the previous page, empty for the first page.
+        :param page_size (int): rows fetched from the server per round trip.
+        :param max_rows (int): maximum number of rows returned.
+        :param max_bytes (int): maximum size of the returned rows once serialized.
+        :param layout (str): 'columnar' or 'records'.
+        :return: fetched rows, continuation token and the limit that ended the page as a JSON string.
+        :rtype: str
+        """
+        logger.info("query_database_paged called", extra={"query_digest": _query_digest(query), "query_chars": len(query)})
+        logger.debug("query_database_paged query", extra={"query": query})
+        try:
+            if layout not in LAYOUTS:
+                raise ValueError(f"Unknown layout '{layout}', expected one of {', '.join(LAYOUTS)}.")
+            offset = decode_continuation_token(query, continuation_token) if continuation_token else 0
+            page_size = max(1, min(page_size, max_rows))
+            normalized = normalize_query(query)
+            variant = ("paged", offset, max_rows, max_bytes, layout)
+            with span("db.query", {"db.system": "postgresql", "db.query.text": query, "db.query.offset": offset}) as current:
+                cached = self.cache.get(normalized, *variant)
+                current.set_attribute("db.cache_hit", cached is not None)
+                if cached is not None:
+                    return cached
+                async with self.pool.lease() as connection:
+                    rows, row_count, encoder, next_offset, stopped_by = await asyncio.to_thread(
+                        _fetch_page, connection, query, offset, page_size, max(1, max_rows), max(1, max_bytes), layout
+                    )
+                current.set_attribute("db.response.returned_rows", row_count)
+            result = encoder.envelope(
+                rows,
+                layout,
+                row_count=row_count,
+                offset=offset,
+                continuation_token=encode_continuation_token(query, next_offset) if next_offset is not None else None,
+                truncated_by=stopped_by,
+            )
+            self.cache.put(normalized, result, *variant)
+            return result
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    @kernel_function(description="Closes the connection to the database.")
+    def close_connection(self) -> Annotated[str, "Returns a message indicating the status of the connection closure."]:
+        """
+        Releases the database connection. Connections are leased per query and go back to
+        the shared pool automatically, so the pool itself stays open for other sessions.
+
+        :return: Message indicating the status of the connection closure.
+        :rtype: str
+        """
+        logger.info("close_connection called")
+        return "Connection closed successfully."
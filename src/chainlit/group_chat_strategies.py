@@ -0,0 +1,150 @@
+"""
+Group chat strategies that settle the common cases in code and only ask the model when
+the conversation state is ambiguous.
+"""
+import logging
+import re
+from collections.abc import Callable
+
+from semantic_kernel.agents import Agent
+from semantic_kernel.agents.strategies import KernelFunctionSelectionStrategy, KernelFunctionTerminationStrategy
+from semantic_kernel.contents import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+_CUSTOMER_ID = re.compile(r"\b\d{1,10}\b")
+_EMAIL_DRAFT = re.compile(r"\b(?:dear|subject:|regards|sincerely)\b", re.IGNORECASE)
+_APPROVAL = re.compile(r"\bapproved\b", re.IGNORECASE)
+_REJECTION = re.compile(r"\b(?:not|isn't|is not|un)[\s-]*approved\b|\b(?:cannot|can't|won't|not) approve\b", re.IGNORECASE)
+_APPROVAL_STEM = re.compile(r"approv", re.IGNORECASE)
+
+
+def _last_reply(history: list[ChatMessageContent]) -> ChatMessageContent | None:
+    """The latest message that is not a tool call or tool result."""
+    for message in reversed(history):
+        if message.role in (AuthorRole.USER, AuthorRole.ASSISTANT) and message.content:
+            return message
+    return None
+
+
+def triage_transitions(orchestrator_name: str, analyst_name: str) -> Callable[[list[ChatMessageContent]], str | None]:
+    """
+    The turn rules of the blocked card triage chat (see ``selection_function`` in the apps)
+    as a function of the history. It returns the next participant, or None when the rules
+    do not settle it.
+    """
+
+    def next_participant(history: list[ChatMessageContent]) -> str | None:
+        last = _last_reply(history)
+        # After user input, it is the orchestrator's turn
+        if last is None or last.role == AuthorRole.USER:
+            return orchestrator_name
+        # After the analyst provides the analysis, the orchestrator drafts the email
+        if last.name == analyst_name:
+            return orchestrator_name
+        if last.name == orchestrator_name:
+            content = last.content
+            # The orchestrator hands the customer ID over to the analyst
+            if f"@{analyst_name}".lower() in content.lower() and _CUSTOMER_ID.search(content):
+                return analyst_name
+            # After drafting the email, the orchestrator approves the analysis
+            if _EMAIL_DRAFT.search(content) and not _APPROVAL.search(content):
+                return orchestrator_name
+        return None
+
+    return next_participant
+
+
+def approval_check(orchestrator_name: str) -> Callable[[list[ChatMessageContent]], bool | None]:
+    """
+    The approval rule of the blocked card triage chat (see ``termination_function`` in
+    app_blocked_card.py) as a function of the history. It returns True when the latest
+    message of the orchestrator approves the analysis, False when it clearly does not, and
+    None when the wording needs the model to decide.
+    """
+
+    def approved(history: list[ChatMessageContent]) -> bool | None:
+        last = next(
+            (
+                message
+                for message in reversed(history)
+                if message.role == AuthorRole.ASSISTANT and message.name == orchestrator_name and message.content
+            ),
+            None,
+        )
+        if last is None or not _APPROVAL_STEM.search(last.content):
+            return False
+        if _REJECTION.search(last.content):
+            return False
+        if _APPROVAL.search(last.content):
+            return True
+        return None
+
+    return approved
+
+
+class StateMachineSelectionStrategy(KernelFunctionSelectionStrategy):
+    """
+    Selects the next agent with ``transitions`` and falls back to the selection prompt of
+    KernelFunctionSelectionStrategy only when the transitions return None (or a name that
+    is not a participant). ``llm_selections`` and ``llm_selections_avoided`` count how
+    often each path was taken.
+    """
+
+    transitions: Callable[[list[ChatMessageContent]], str | None]
+    llm_selections: int = 0
+    llm_selections_avoided: int = 0
+
+    async def select_agent(self, agents: list[Agent], history: list[ChatMessageContent]) -> Agent:
+        with span("group_chat.selection") as current:
+            name = self.transitions(history)
+            if name is not None:
+                agent = next((agent for agent in agents if agent.name == name), None)
+                if agent is not None:
+                    self.llm_selections_avoided += 1
+                    logger.info("selection prompt skipped", extra={"strategy": type(self).__name__, "method": "state_machine", "agent": name})
+                    current.set_attributes({"group_chat.selection.method": "state_machine", "group_chat.agent": name})
+                    return agent
+
+            self.llm_selections += 1
+            agent = await super().select_agent(agents, history)
+            current.set_attributes({"group_chat.selection.method": "prompt", "group_chat.agent": agent.name})
+            return agent
+
+    def stats(self) -> dict:
+        """Returns how many selections needed the model and how many were settled in code."""
+        return {"llm_selections": self.llm_selections, "llm_selections_avoided": self.llm_selections_avoided}
+
+
+class LayeredTerminationStrategy(KernelFunctionTerminationStrategy):
+    """
+    Decides termination with ``precheck`` and invokes the termination prompt of
+    KernelFunctionTerminationStrategy only when the precheck returns None.
+    ``llm_terminations`` and ``llm_terminations_skipped`` count how often each path was
+    taken; the strategy is created per conversation, so they are per conversation too.
+    """
+
+    precheck: Callable[[list[ChatMessageContent]], bool | None]
+    llm_terminations: int = 0
+    llm_terminations_skipped: int = 0
+
+    async def should_agent_terminate(self, agent: Agent, history: list[ChatMessageContent]) -> bool:
+        with span("group_chat.termination", {"group_chat.agent": agent.name}) as current:
+            decision = self.precheck(history)
+            if decision is not None:
+                self.llm_terminations_skipped += 1
+                logger.info("termination prompt skipped", extra={"strategy": type(self).__name__, "method": "precheck", "agent": agent.name, "terminate": decision})
+                current.set_attributes({"group_chat.termination.method": "precheck", "group_chat.terminate": decision})
+                return decision
+
+            self.llm_terminations += 1
+            decision = await super().should_agent_terminate(agent, history)
+            current.set_attributes({"group_chat.termination.method": "prompt", "group_chat.terminate": decision})
+            return decision
+
+    def stats(self) -> dict:
+        """Returns how many termination checks needed the model and how many were settled in code."""
+        return {"llm_terminations": self.llm_terminations, "llm_terminations_skipped": self.llm_terminations_skipped}
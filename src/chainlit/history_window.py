@@ -0,0 +1,98 @@
+"""
+A bounded view of the group chat history for the selection and termination prompts.
+
+Those prompts only need to know who spoke last and what was decided, yet by default
+they render the whole history on every turn. RollingSummaryReducer keeps the last
+``target_count`` messages verbatim and folds everything older into one summary message.
+The summary is extractive (speaker plus the first sentence of each message), so it costs
+no model call, and it is extended incrementally as messages leave the window instead of
+being rebuilt every turn.
+"""
+import re
+import sys
+
+from pydantic import PrivateAttr
+from semantic_kernel.contents import ChatMessageContent
+from semantic_kernel.contents.history_reducer.chat_history_reducer import ChatHistoryReducer
+from semantic_kernel.contents.history_reducer.chat_history_reducer_utils import SUMMARY_METADATA_KEY
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+if sys.version_info < (3, 11):
+    from typing_extensions import Self
+else:
+    from typing import Self
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+
+
+def summarize_message(message: ChatMessageContent, max_chars: int) -> str | None:
+    """One summary line for ``message``, or None for messages without text (tool calls and results)."""
+    if message.role == AuthorRole.TOOL or not message.content:
+        return None
+    text = " ".join(message.content.split())
+    first = _SENTENCE_END.split(message.content.strip(), maxsplit=1)[0]
+    first = " ".join(first.split()) or text
+    if len(first) > max_chars:
+        first = first[: max_chars - 3].rstrip() + "..."
+    return f"{message.name or message.role.value}: {first}"
+
+
+class RollingSummaryReducer(ChatHistoryReducer):
+    """
+    Keeps the last ``target_count`` messages and a rolling summary of the older ones.
+
+    The strategies hand the full history to ``reduce`` on every turn. Only the messages
+    that left the window since the previous call are summarized, and the summary keeps
+    at most ``max_summary_lines`` lines, dropping the oldest first.
+    """
+
+    summary_line_chars: int = 160
+    max_summary_lines: int = 20
+
+    _summary_lines: list[str] = PrivateAttr(default_factory=list)
+    _summarized_count: int = PrivateAttr(default=0)
+    _first_message_id: int | None = PrivateAttr(default=None)
+
+    def _window_start(self, history: list[ChatMessageContent]) -> int:
+        start = max(len(history) - self.target_count, 0)
+        # Keep tool results together with the call that produced them
+        while start > 0 and history[start].role == AuthorRole.TOOL:
+            start -= 1
+        return start
+
+    def _extend_summary(self, history: list[ChatMessageContent], start: int) -> None:
+        first_id = id(history[0]) if history else None
+        if start < self._summarized_count or first_id != self._first_message_id:
+            # A different or rewound history, start over
+            self._summary_lines = []
+            self._summarized_count = 0
+            self._first_message_id = first_id
+
+        for message in history[self._summarized_count : start]:
+            line = summarize_message(message, self.summary_line_chars)
+            if line is not None:
+                self._summary_lines.append(line)
+        self._summarized_count = start
+        del self._summary_lines[: -self.max_summary_lines]
+
+    async def reduce(self) -> Self | None:
+        history = self.messages
+        if len(history) <= self.target_count + self.threshold_count:
+            return None
+
+        start = self._window_start(history)
+        if start == 0:
+            return None
+        self._extend_summary(history, start)
+
+        summary = ChatMessageContent(
+            role=AuthorRole.SYSTEM,
+            content="Summary of earlier turns:\n" + "\n".join(self._summary_lines),
+            metadata={SUMMARY_METADATA_KEY: True},
+        )
+        self.messages = [summary, *history[start:]]
+        return self
+
+    def summary(self) -> list[str]:
+        """Returns the current summary lines."""
+        return list(self._summary_lines)
@@ -0,0 +1,338 @@
+"""
+A deterministic, local stand-in for AzureChatCompletion.
+
+LocalChatCompletion answers from rules instead of a model, so the agents, the group chat
+strategies, the plugins and the Chainlit handlers can be load-tested without an Azure
+OpenAI endpoint. It supports tool calls (with the same auto invocation loop as the real
+service), streaming token by token, and a configurable latency per response and per
+token. Select it with CHAT_COMPLETION_BACKEND=local, see service_registry.get_chat_service.
+
+Rules are tried in order and the first one returning a message wins:
+
+    script        CHAT_LOCAL_SCRIPT, a JSON file of {"match": regex, "reply": text} entries
+                  matched against the latest message
+    strategies    the selection and termination prompts of the group chats
+    blocked card  the BusinessAnalyst tool flow (card status, then auth failures)
+    sql           query_database for the SQL agents: one lookup by the latest number, then
+                  a reply quoting the result
+    transcripts   the blocked_card(_structured) and blocked_reason prompt functions, by keyword
+    weather       get_weather for "weather in <city>" questions
+    triage        the TriageAgent: ask for the customer ID, hand it over, draft and approve
+    fallback      a short acknowledgement
+"""
+import asyncio
+import itertools
+import json
+import os
+import re
+from collections.abc import AsyncGenerator, Callable
+from typing import Any
+
+from pydantic import Field
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.function_calling_utils import update_settings_from_function_call_configuration
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import (
+    ChatHistory,
+    ChatMessageContent,
+    FunctionCallContent,
+    FunctionResultContent,
+    StreamingChatMessageContent,
+    StreamingTextContent,
+)
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.contents.utils.finish_reason import FinishReason
+
+Rule = Callable[[list[ChatMessageContent], list[str]], "ChatMessageContent | None"]
+
+_DIGITS = re.compile(r"\b\d{1,10}\b")
+_CITY = re.compile(r"weather (?:in|for|like in) ([A-Za-z][A-Za-z .'-]*?)\s*(?:[?.!,]|today|now|$)", re.IGNORECASE)
+_PARTICIPANT = re.compile(r"^\s*-\s*(\w+)\s*$", re.MULTILINE)
+_SPEAKER = re.compile(r"'name': '(\w+)'")
+_TRANSCRIPT_CUSTOMER = re.compile(r"Customer ID\s*:\s*(\d+)", re.IGNORECASE)
+_CARD_BLOCKED = re.compile(r"\bcard\b[^.?!\n]{0,40}\bblocked\b|\bblocked\b[^.?!\n]{0,20}\bcard\b", re.IGNORECASE)
+_TABLE = re.compile(r"'(\w+)' table|table (\w+)")
+# Key column of the demo tables, used to look a row up by the number the user gave
+_KEY_COLUMNS = {"accounts": "account_id", "customerdata": "customer_id"}
+
+_call_ids = itertools.count(1)
+
+
+def _reply(text: str) -> ChatMessageContent:
+    return ChatMessageContent(role=AuthorRole.ASSISTANT, content=text, finish_reason=FinishReason.STOP)
+
+
+def _call(name: str, **arguments) -> ChatMessageContent:
+    return ChatMessageContent(
+        role=AuthorRole.ASSISTANT,
+        items=[FunctionCallContent(id=f"call_{next(_call_ids)}", name=name, arguments=json.dumps(arguments))],
+        finish_reason=FinishReason.TOOL_CALLS,
+    )
+
+
+def _latest_text(messages: list[ChatMessageContent]) -> ChatMessageContent | None:
+    for message in reversed(messages):
+        if message.role in (AuthorRole.USER, AuthorRole.ASSISTANT) and message.content:
+            return message
+    return None
+
+
+def _pending_results(messages: list[ChatMessageContent]) -> dict[str, str]:
+    """Tool results returned since the latest text message, by fully qualified tool name."""
+    results = {}
+    for message in reversed(messages):
+        if message.role == AuthorRole.TOOL:
+            for item in message.items:
+                if isinstance(item, FunctionResultContent):
+                    results.setdefault(item.name, str(item.result))
+        elif not (message.role == AuthorRole.ASSISTANT and not message.content):
+            break
+    return results
+
+
+def _last_number(messages: list[ChatMessageContent]) -> str | None:
+    for message in reversed(messages):
+        if message.role in (AuthorRole.USER, AuthorRole.ASSISTANT) and message.content:
+            numbers = _DIGITS.findall(message.content)
+            if numbers:
+                return numbers[-1]
+    return None
+
+
+def script_rule(script: list[dict]) -> Rule:
+    """Replies with the first ``{"match": regex, "reply": text}`` entry matching the latest message."""
+    compiled = [(re.compile(entry["match"], re.IGNORECASE), entry["reply"]) for entry in script]
+
+    def rule(messages, tools):
+        latest = _latest_text(messages)
+        if latest is None:
+            return None
+        for pattern, reply in compiled:
+            if pattern.search(latest.content):
+                return _reply(reply)
+        return None
+
+    return rule
+
+
+def strategy_rule(messages, tools):
+    """The selection and termination prompts of KernelFunctionSelection/TerminationStrategy."""
+    latest = _latest_text(messages)
+    if latest is None or latest.role != AuthorRole.USER:
+        return None
+    prompt = latest.content
+    history = prompt.rsplit("History:", 1)[-1]
+    if "takes the next turn" in prompt:
+        participants = _PARTICIPANT.findall(prompt.split("History:", 1)[0])
+        speakers = _SPEAKER.findall(history)
+        if not participants:
+            return None
+        # Nobody takes two turns in a row
+        others = [name for name in participants if not speakers or name != speakers[-1]]
+        return _reply((others or participants)[0])
+    if "approved" in prompt.split("History:", 1)[0]:
+        approved = re.search(r"\bapproved\b", history, re.IGNORECASE) and not re.search(
+            r"\bnot approved\b", history, re.IGNORECASE
+        )
+        return _reply("yes" if approved else "no")
+    return None
+
+
+def blocked_card_rule(messages, tools):
+    """The BusinessAnalyst flow of app_blocked_card.py."""
+    if "blocked_card-get_customer_card_status" not in tools:
+        return None
+    results = _pending_results(messages)
+    status_result = results.get("blocked_card-get_customer_card_status")
+    if status_result is None:
+        customer_id = _last_number(messages)
+        if customer_id is None:
+            return _reply("@TriageAgent Please provide the customer ID.")
+        return _call("blocked_card-get_customer_card_status", customer_id=int(customer_id))
+
+    status = json.loads(status_result)
+    if "error" in status:
+        return _reply(f"@TriageAgent The card status could not be determined: {status['error']}")
+    if not status.get("card_blocked"):
+        return _reply(f"@TriageAgent The card of customer {status.get('customer_id')} is not blocked.")
+
+    failures_result = results.get("blocked_card-count_recent_auth_failures")
+    if failures_result is None:
+        return _call("blocked_card-count_recent_auth_failures", card_no=str(status["credit_card_no"]), window=30)
+    failures = json.loads(failures_result)
+    if failures.get("blocked_due_to_authentication_failures"):
+        reason = f"blocked because of {failures['failed_authentications']} failed authentications recently"
+    else:
+        reason = "blocked for an unknown reason"
+    return _reply(f"@TriageAgent The card of customer {status.get('customer_id')} is {reason}.")
+
+
+def sql_rule(messages, tools):
+    """The SQL agents (app.py, the BusinessAnalyst of ForgotPinAgentChat.py) with a query_database tool."""
+    tool = next((name for name in tools if name.endswith("-query_database")), None)
+    if tool is None:
+        return None
+    results = _pending_results(messages)
+    if tool in results:
+        return _reply(f"The query returned: {results[tool][:200]}")
+    key = _last_number(messages)
+    if key is None:
+        return None
+    system = next((message.content for message in messages if message.role == AuthorRole.SYSTEM), "")
+    table = next((name for match in _TABLE.finditer(system) for name in match.groups() if name in _KEY_COLUMNS), "accounts")
+    return _call(tool, query=f"SELECT * FROM {table} WHERE {_KEY_COLUMNS[table]} = {key}")
+
+
+def transcript_rule(messages, tools):
+    """The prompt functions of src/plugins/prompt_templates/func: blocked_card(_structured) and blocked_reason."""
+    latest = _latest_text(messages)
+    if latest is None or latest.role != AuthorRole.USER or "call transcript" not in latest.content:
+        return None
+    prompt = latest.content
+    match = _TRANSCRIPT_CUSTOMER.search(prompt)
+    customer = match.group(1) if match else ""
+    # blocked_reason states its output format after the transcript
+    transcript = prompt.split("transcript:", 1)[-1].split("The output should", 1)[0]
+    blocked = _CARD_BLOCKED.search(transcript) is not None
+    if "response schema" in prompt:
+        return _reply(json.dumps({"customer": customer, "card_blocked": blocked}))
+    if "well formed json" in prompt:
+        return _reply(json.dumps({"customer": customer, "card_blocked": "yes" if blocked else "no"}))
+    return _reply(f"Card {'' if blocked else 'not '}blocked for customer : {customer}")
+
+
+def weather_rule(messages, tools):
+    """The weather agent of app_simple_weather_agent.py."""
+    if "weather_plugin-get_weather" not in tools:
+        return None
+    results = _pending_results(messages)
+    if "weather_plugin-get_weather" in results:
+        return _reply(results["weather_plugin-get_weather"])
+    latest = _latest_text(messages)
+    match = _CITY.search(latest.content) if latest is not None else None
+    if match is None:
+        return None
+    return _call("weather_plugin-get_weather", city=match.group(1).strip())
+
+
+def triage_rule(messages, tools):
+    """The TriageAgent of the multi-agent apps."""
+    system = next((message.content for message in messages if message.role == AuthorRole.SYSTEM), "")
+    if "triaging agent" not in system:
+        return None
+    latest = _latest_text(messages)
+    if latest is not None and latest.role == AuthorRole.ASSISTANT and latest.name == "BusinessAnalyst":
+        analysis = latest.content.replace("@TriageAgent", "").strip()
+        return _reply(
+            "Dear customer,\n\n"
+            f"{analysis}\n\n"
+            "Please contact us if you have any questions.\n\nKind regards,\nCard Services\n\n"
+            "The analysis is approved."
+        )
+    customer_id = _last_number([message for message in messages if message.role == AuthorRole.USER])
+    if customer_id is None:
+        return _reply("Please provide your customer ID to continue.")
+    return _reply(f"@BusinessAnalyst please determine the reason for the blocked card of customer {customer_id}.")
+
+
+def fallback_rule(messages, tools):
+    latest = _latest_text([message for message in messages if message.role == AuthorRole.USER])
+    return _reply(f"Understood: {latest.content[:80]}" if latest is not None else "Hello!")
+
+
+DEFAULT_RULES: list[Rule] = [strategy_rule, transcript_rule, blocked_card_rule, sql_rule, weather_rule, triage_rule, fallback_rule]
+
+
+class LocalChatCompletion(ChatCompletionClientBase):
+    """
+    Rule-based chat completion service. ``latency`` is the time to the first token (the
+    whole response when not streaming), ``token_delay`` the time between streamed tokens.
+    """
+
+    SUPPORTS_FUNCTION_CALLING = True
+
+    latency: float = 0.0
+    token_delay: float = 0.0
+    rules: list[Any] = Field(default_factory=lambda: list(DEFAULT_RULES))
+
+    @classmethod
+    def from_env(cls, service_id: str) -> "LocalChatCompletion":
+        """Builds the service from CHAT_LOCAL_LATENCY, CHAT_LOCAL_TOKEN_DELAY and CHAT_LOCAL_SCRIPT."""
+        rules = list(DEFAULT_RULES)
+        script_path = os.getenv("CHAT_LOCAL_SCRIPT")
+        if script_path:
+            with open(script_path, encoding="utf-8") as file:
+                rules.insert(0, script_rule(json.load(file)))
+        return cls(
+            service_id=service_id,
+            ai_model_id="local",
+            latency=float(os.getenv("CHAT_LOCAL_LATENCY", "0.5")),
+            token_delay=float(os.getenv("CHAT_LOCAL_TOKEN_DELAY", "0.01")),
+            rules=rules,
+        )
+
+    def get_prompt_execution_settings_class(self) -> type[PromptExecutionSettings]:
+        return OpenAIChatPromptExecutionSettings
+
+    def _update_function_choice_settings_callback(self):
+        return update_settings_from_function_call_configuration
+
+    def _reset_function_choice_settings(self, settings: PromptExecutionSettings) -> None:
+        if hasattr(settings, "tool_choice"):
+            settings.tool_choice = None
+        if hasattr(settings, "tools"):
+            settings.tools = None
+
+    def _respond(self, chat_history: ChatHistory, settings: PromptExecutionSettings) -> ChatMessageContent:
+        tools = [tool["function"]["name"] for tool in getattr(settings, "tools", None) or []]
+        for rule in self.rules:
+            message = rule(chat_history.messages, tools)
+            if message is not None:
+                message.ai_model_id = self.ai_model_id
+                return message
+        raise RuntimeError("No rule produced a reply.")
+
+    async def _inner_get_chat_message_contents(
+        self, chat_history: ChatHistory, settings: PromptExecutionSettings
+    ) -> list[ChatMessageContent]:
+        message = self._respond(chat_history, settings)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [message]
+
+    async def _inner_get_streaming_chat_message_contents(
+        self, chat_history: ChatHistory, settings: PromptExecutionSettings, function_invoke_attempt: int = 0
+    ) -> AsyncGenerator[list[StreamingChatMessageContent], Any]:
+        message = self._respond(chat_history, settings)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        calls = [item for item in message.items if isinstance(item, FunctionCallContent)]
+        if calls:
+            yield [
+                StreamingChatMessageContent(
+                    role=AuthorRole.ASSISTANT,
+                    choice_index=0,
+                    items=[call.model_copy(update={"index": index}) for index, call in enumerate(calls)],
+                    ai_model_id=self.ai_model_id,
+                    finish_reason=message.finish_reason,
+                    function_invoke_attempt=function_invoke_attempt,
+                )
+            ]
+            return
+
+        tokens = re.findall(r"\S+\s*", message.content)
+        for position, token in enumerate(tokens):
+            if position and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield [
+                StreamingChatMessageContent(
+                    role=AuthorRole.ASSISTANT,
+                    choice_index=0,
+                    items=[StreamingTextContent(choice_index=0, text=token)],
+                    ai_model_id=self.ai_model_id,
+                    finish_reason=message.finish_reason if position == len(tokens) - 1 else None,
+                    function_invoke_attempt=function_invoke_attempt,
+                )
+            ]
@@ -0,0 +1,202 @@
+"""
+Process-wide registry of the prompt functions in src/plugins/prompt_templates.
+
+Every ``<plugin>/<function>/`` directory with a skprompt.txt and a config.json is read and
+compiled (the template is parsed into blocks) once, on first use, into one KernelPlugin per
+plugin directory. Every kernel and batch worker is handed the same plugin and function
+objects instead of building its own from the files:
+
+    kernel.add_plugin(get_prompt_registry().plugin("func"))
+    function = get_prompt_registry().get("func", "blocked_card")
+
+The functions are never changed once built. ``watch()`` polls the files every
+CHAT_PROMPT_RELOAD_S seconds (2, 0 turns it off) and recompiles only the functions whose
+files changed, swapping the new function into the shared plugin, so the next call of any
+kernel uses it without a restart. A template that fails to compile is logged and the
+previous version is kept. ``stats()`` returns the load time of every function and, for the
+kernels passed to ``add_render_timing``, how long rendering its prompt took.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from semantic_kernel import Kernel
+from semantic_kernel.filters import FilterTypes
+from semantic_kernel.functions import KernelFunctionFromPrompt, KernelPlugin
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plugins", "prompt_templates")
+_FILES = ("skprompt.txt", "config.json")
+
+_shared_registry: "PromptRegistry | None" = None
+
+
+@dataclass
+class TemplateStats:
+    """Load and render timings of one prompt function."""
+
+    version: tuple = ()
+    loads: int = 0
+    load_ms: float = 0.0
+    renders: int = 0
+    render_ms_total: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "loads": self.loads,
+            "load_ms": round(self.load_ms, 3),
+            "renders": self.renders,
+            "render_ms_mean": round(self.render_ms_total / self.renders, 4) if self.renders else None,
+        }
+
+
+class PromptRegistry:
+    """
+    Compiled prompt functions of ``directory``, by plugin and function name.
+
+    :param directory (str): folder of ``<plugin>/<function>/`` template directories.
+    """
+
+    def __init__(self, directory: str = PROMPT_TEMPLATES):
+        self.directory = directory
+        self._plugins: dict[str, KernelPlugin] = {}
+        self._stats: dict[str, TemplateStats] = {}
+        self._watcher: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "PromptRegistry":
+        """Builds the registry for CHAT_PROMPT_TEMPLATES (src/plugins/prompt_templates)."""
+        return cls(os.getenv("CHAT_PROMPT_TEMPLATES", PROMPT_TEMPLATES))
+
+    def _template_dirs(self):
+        for plugin_name in sorted(os.listdir(self.directory)):
+            plugin_dir = os.path.join(self.directory, plugin_name)
+            if not os.path.isdir(plugin_dir):
+                continue
+            for function_name in sorted(os.listdir(plugin_dir)):
+                path = os.path.join(plugin_dir, function_name)
+                if all(os.path.isfile(os.path.join(path, file)) for file in _FILES):
+                    yield plugin_name, function_name, path
+
+    @staticmethod
+    def _version(path: str) -> tuple:
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in (os.stat(os.path.join(path, file)) for file in _FILES))
+
+    def _compile(self, plugin_name: str, function_name: str, path: str) -> KernelFunctionFromPrompt:
+        stats = self._stats.setdefault(f"{plugin_name}.{function_name}", TemplateStats())
+        version = self._version(path)
+        started = time.perf_counter()
+        function = KernelFunctionFromPrompt.from_directory(path, plugin_name=plugin_name)
+        stats.load_ms = (time.perf_counter() - started) * 1000
+        stats.loads += 1
+        stats.version = version
+        return function
+
+    def load(self) -> None:
+        """Reads and compiles every template, replacing what was loaded before."""
+        plugins: dict[str, dict[str, KernelFunctionFromPrompt]] = {}
+        for plugin_name, function_name, path in self._template_dirs():
+            plugins.setdefault(plugin_name, {})[function_name] = self._compile(plugin_name, function_name, path)
+        # Kernels add these plugin objects as they are, so they all share the same functions
+        self._plugins = {name: KernelPlugin(name=name, functions=functions) for name, functions in plugins.items()}
+        logger.info("prompt templates loaded", extra={"functions": len(self._stats), "directory": self.directory})
+
+    def plugin(self, plugin_name: str) -> KernelPlugin:
+        """Returns the shared plugin ``plugin_name``, to add to a kernel as it is."""
+        if not self._plugins:
+            self.load()
+        return self._plugins[plugin_name]
+
+    def get(self, plugin_name: str, function_name: str) -> KernelFunctionFromPrompt:
+        """Returns the current compiled version of ``plugin_name.function_name``."""
+        return self.plugin(plugin_name).functions[function_name]
+
+    def reload_changed(self) -> list[str]:
+        """
+        Recompiles the templates whose files changed since they were loaded, and loads the
+        new ones.
+
+        :return: the names of the functions reloaded.
+        :rtype: list
+        """
+        if not self._plugins:
+            self.load()
+            return []
+        reloaded = []
+        for plugin_name, function_name, path in self._template_dirs():
+            name = f"{plugin_name}.{function_name}"
+            stats = self._stats.get(name)
+            if stats is not None and stats.version == self._version(path):
+                continue
+            try:
+                function = self._compile(plugin_name, function_name, path)
+            except Exception as e:
+                # Keep serving the previous version, and do not try again until the files change
+                self._stats.setdefault(name, TemplateStats()).version = self._version(path)
+                logger.error("prompt template failed to compile", extra={"function": name, "error": str(e)})
+                continue
+            plugin = self._plugins.get(plugin_name)
+            if plugin is None:
+                self._plugins[plugin_name] = KernelPlugin(name=plugin_name, functions={function_name: function})
+            else:
+                plugin.functions[function_name] = function
+            reloaded.append(name)
+        if reloaded:
+            logger.info("prompt templates reloaded", extra={"functions": reloaded})
+        return reloaded
+
+    def watch(self, interval: float | None = None) -> asyncio.Task | None:
+        """
+        Starts polling the template files on the running loop, unless already started or
+        ``interval`` (CHAT_PROMPT_RELOAD_S) is 0.
+
+        :param interval (float): seconds between two checks of the files.
+        :return: the polling task, or None when hot reload is off.
+        :rtype: asyncio.Task
+        """
+        interval = float(os.getenv("CHAT_PROMPT_RELOAD_S", "2")) if interval is None else interval
+        if interval <= 0:
+            return None
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.ensure_future(self._poll(interval))
+        return self._watcher
+
+    async def _poll(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            # stat() of a few files, cheap enough for the event loop
+            self.reload_changed()
+
+    def stop(self) -> None:
+        """Stops the polling task started by ``watch``."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def add_render_timing(self, kernel: Kernel) -> None:
+        """Adds a filter to ``kernel`` that times the rendering of the registry's prompts."""
+
+        async def render_timing_filter(context, next):
+            started = time.perf_counter()
+            await next(context)
+            stats = self._stats.get(f"{context.function.plugin_name}.{context.function.name}")
+            if stats is not None:
+                stats.renders += 1
+                stats.render_ms_total += (time.perf_counter() - started) * 1000
+
+        kernel.add_filter(FilterTypes.PROMPT_RENDERING, render_timing_filter)
+
+    def stats(self) -> dict[str, dict]:
+        """Load and render timings per function, by ``plugin.function`` name."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Returns the process-wide prompt registry."""
+    global _shared_registry
+    if _shared_registry is None:
+        _shared_registry = PromptRegistry.from_env()
+    return _shared_registry
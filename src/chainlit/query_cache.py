@@ -0,0 +1,284 @@
+"""
+Result cache for the SQL the agents send through DatabaseConnector.
+
+Entries are keyed by the normalized SQL text (whitespace collapsed, keywords and
+identifiers lower-cased, string literals and double-quoted identifiers left untouched),
+kept in LRU order up to ``max_entries`` and expire after the TTL of the tables they read.
+Queries calling a volatile or time dependent function (random(), now(), current_date...)
+are not cached. Any write statement that goes through the same connector drops every
+entry that reads one of the tables it touches. A query reading a relation that is not a table (e.g. a set returning function) is
+not cached, and a write whose tables cannot be resolved drops every entry.
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+
+# String literals and double-quoted identifiers, both case sensitive
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_TOKEN = re.compile(r'"[^"]*"|\w+|\S')
+_WORD = re.compile(r'"[^"]*"|[a-z_]\w*')
+# Keywords that introduce a relation, and the words that end a list of relations
+_RELATION_START = {"from", "join", "using", "update", "into", "table"}
+_LIST_END = {
+    "where", "group", "having", "order", "limit", "offset", "fetch", "for", "window", "union", "intersect",
+    "except", "returning", "join", "using", ")", ";",
+}
+_WRITE = re.compile(r"\b(?:insert|update|delete|merge|truncate|alter|drop|create|copy|call)\b")
+# Functions whose result changes between two runs of the same query, time included
+_VOLATILE = re.compile(
+    r"\b(?:random|nextval|setval|clock_timestamp|gen_random_uuid|pg_sleep|now|statement_timestamp|"
+    r"transaction_timestamp|timeofday)\s*\("
+    r"|\b(?:current_date|current_time|current_timestamp|localtime|localtimestamp)\b"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of ``query`` used as cache key."""
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    for index in range(0, len(parts), 2):
+        parts[index] = " ".join(parts[index].lower().split())
+    return "".join(parts)
+
+
+def _without_literals(normalized: str) -> str:
+    return _QUOTED.sub(lambda match: match.group(0) if match.group(0)[0] == '"' else "''", normalized)
+
+
+def _skip_parens(tokens: list, index: int) -> int:
+    """Index after the parenthesis group opening at ``tokens[index]``."""
+    depth = 0
+    for index in range(index, len(tokens)):
+        depth += {"(": 1, ")": -1}.get(tokens[index], 0)
+        if depth == 0:
+            return index + 1
+    return len(tokens)
+
+
+def _cte_names(tokens: list) -> set:
+    """Names defined by WITH, as in ``name [(columns)] as [[not] materialized] (``."""
+    names = set()
+    for index, token in enumerate(tokens):
+        if token != "as":
+            continue
+        after = index + 1
+        while after < len(tokens) and tokens[after] in ("not", "materialized"):
+            after += 1
+        if after >= len(tokens) or tokens[after] != "(" or index == 0:
+            continue
+        before = index - 1
+        if tokens[before] == ")":
+            depth = 0
+            while before >= 0:
+                depth += {")": 1, "(": -1}.get(tokens[before], 0)
+                if depth == 0:
+                    break
+                before -= 1
+            before -= 1
+        if before >= 0 and _WORD.fullmatch(tokens[before]):
+            names.add(tokens[before].strip('"').lower())
+    return names
+
+
+def _relations(tokens: list) -> set | None:
+    """Tables of the relation lists in ``tokens``, None if one of them is not a table."""
+    tables = set()
+    index = 0
+    while index < len(tokens):
+        keyword = tokens[index]
+        index += 1
+        if keyword not in _RELATION_START:
+            continue
+        listed = keyword in ("from", "join", "using")
+        while index < len(tokens):
+            if tokens[index] in ("only", "lateral"):
+                index += 1
+                continue
+            if tokens[index] == "(":
+                # A subquery, or the column list of INSERT INTO or JOIN USING
+                end = _skip_parens(tokens, index)
+                inner = _relations(tokens[index + 1 : end - 1])
+                if inner is None:
+                    return None
+                tables |= inner
+                index = end
+            elif _WORD.fullmatch(tokens[index]):
+                name = tokens[index]
+                index += 1
+                while index + 1 < len(tokens) and tokens[index] == "." and _WORD.fullmatch(tokens[index + 1]):
+                    name = tokens[index + 1]
+                    index += 2
+                if listed and index < len(tokens) and tokens[index] == "(":
+                    # A set returning function, not a table
+                    return None
+                # Lower-cased, so "Foo" and foo share their invalidations and TTL
+                tables.add(name.strip('"').lower())
+            elif listed and tokens[index] != "'" and not tokens[index].isdigit():
+                # A FROM of an expression, e.g. substring(x from 2), is not a relation
+                return None
+            else:
+                break
+            if not listed:
+                break
+            # Skip the alias, column aliases and join condition up to the next relation of the
+            # list (after a comma) or the end of the list
+            while index < len(tokens) and tokens[index] not in _LIST_END and tokens[index] != ",":
+                if tokens[index] == "(":
+                    end = _skip_parens(tokens, index)
+                    inner = _relations(tokens[index + 1 : end - 1])
+                    if inner is None:
+                        return None
+                    tables |= inner
+                    index = end
+                else:
+                    index += 1
+            if index < len(tokens) and tokens[index] == ",":
+                index += 1
+                continue
+            break
+    return tables
+
+
+def referenced_tables(normalized: str) -> frozenset | None:
+    """
+    Returns the unqualified names of the tables a normalized query reads or writes: every
+    relation of a FROM list (comma separated or joined), of subqueries and of WITH bodies,
+    without the names the WITH clause defines.
+
+    :param normalized (str): query as returned by normalize_query.
+    :return: the table names, or None when a relation cannot be resolved to a table (e.g. a
+        set returning function), so the caller cannot know what the result depends on.
+    :rtype: frozenset
+    """
+    tokens = _TOKEN.findall(_without_literals(normalized))
+    tables = _relations(tokens)
+    if tables is None:
+        return None
+    if "with" in tokens:
+        tables -= _cte_names(tokens)
+    return frozenset(tables)
+
+
+def is_write(normalized: str) -> bool:
+    """True if the normalized query may modify data or schema."""
+    return _WRITE.search(_without_literals(normalized)) is not None
+
+
+class QueryCache:
+    """Size-bounded LRU cache of query results with per-table TTLs."""
+
+    def __init__(self, max_entries: int = 512, default_ttl: float = 30.0, table_ttls: dict | None = None, clock=time.monotonic):
+        """
+        :param max_entries: entries kept before the least recently used one is evicted, 0 disables the cache.
+        :param default_ttl: seconds an entry lives when none of its tables has its own TTL.
+        :param table_ttls: TTL in seconds per table name; an entry lives as long as its shortest table TTL,
+            and a TTL of 0 keeps results of that table out of the cache.
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.table_ttls = {name.lower(): ttl for name, ttl in (table_ttls or {}).items()}
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "QueryCache":
+        """
+        Builds a cache from QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL and QUERY_CACHE_TABLE_TTLS,
+        the latter formatted as ``customerdata=60,credit_card_transactions=15``.
+        """
+        table_ttls = {}
+        for item in os.getenv("QUERY_CACHE_TABLE_TTLS", "").split(","):
+            if "=" in item:
+                name, ttl = item.split("=", 1)
+                table_ttls[name.strip()] = float(ttl)
+        return cls(
+            max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512")),
+            default_ttl=float(os.getenv("QUERY_CACHE_TTL", "30")),
+            table_ttls=table_ttls,
+        )
+
+    def ttl_for(self, tables: frozenset) -> float:
+        """TTL of a result that reads ``tables``."""
+        ttls = [self.table_ttls[table] for table in tables if table in self.table_ttls]
+        return min(ttls) if ttls else self.default_ttl
+
+    def get(self, normalized: str, *variant):
+        """Returns the cached result of ``normalized`` (and ``variant`` arguments), or None."""
+        key = (normalized, *variant)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, value = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, normalized: str, value, *variant) -> None:
+        """
+        Caches ``value`` unless the query is a write, volatile, reads an uncached table, or
+        reads a relation that cannot be resolved to a table.
+        """
+        if self.max_entries <= 0 or is_write(normalized) or _VOLATILE.search(_without_literals(normalized)):
+            return
+        tables = referenced_tables(normalized)
+        if tables is None:
+            return
+        ttl = self.ttl_for(tables)
+        if ttl <= 0:
+            return
+        key = (normalized, *variant)
+        self._entries[key] = (self._clock() + ttl, tables, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tables) -> int:
+        """
+        Drops every entry that reads one of ``tables``, or every entry when ``tables`` is None
+        (the written tables are unknown); returns the number dropped.
+        """
+        if tables is None:
+            stale = list(self._entries)
+        else:
+            tables = {table.lower() for table in tables}
+            stale = [key for key, (_, entry_tables, _) in self._entries.items() if not tables.isdisjoint(entry_tables)]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drops every entry; the counters are kept."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+_shared_cache = None
+
+
+def get_query_cache() -> QueryCache:
+    """Returns the process-wide cache shared by every DatabaseConnector and every session."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = QueryCache.from_env()
+    return _shared_cache
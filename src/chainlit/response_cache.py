@@ -0,0 +1,358 @@
+"""
+A response cache in front of the chat completion service.
+
+Greetings, the "please provide your customer ID" exchange and the same weather questions
+reach the model again and again with identical messages. CachedChatCompletion wraps a
+chat completion service and answers such requests from a two tier cache: an in-memory
+LRU and an optional SQLite file shared by the processes of one host. Entries expire
+after a TTL in both tiers.
+
+The key is a hash of the messages as sent to the service (whitespace normalized), the
+execution settings and the tool definitions. A request whose history holds the result of
+a tool call is never cached, since those results carry customer data, unless the tool is
+listed in ``cacheable_tools`` (e.g. ``weather_plugin-get_weather``).
+
+The cache is off unless CHAT_CACHE_TTL is set. Selection and termination strategies render
+the whole group chat history, tool output included, as plain text into one prompt, which
+this check cannot see, so their services are never wrapped (see
+service_registry.get_chat_service).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import (
+    ChatHistory,
+    ChatMessageContent,
+    FunctionResultContent,
+    StreamingChatMessageContent,
+    StreamingTextContent,
+    TextContent,
+)
+
+# Settings that change how the response is delivered, not what it is
+_TRANSPORT_SETTINGS = ("messages", "stream", "stream_options")
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+class ResponseCache:
+    """
+    Two tier TTL cache of serialized responses.
+
+    The memory tier keeps the ``max_entries`` most recently used entries. The disk tier,
+    enabled with ``path``, keeps ``max_disk_entries`` entries and evicts the least
+    recently used ones; a disk hit is promoted to the memory tier.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        max_entries: int = 512,
+        path: str | None = None,
+        max_disk_entries: int = 10000,
+        cacheable_tools: frozenset = frozenset(),
+        clock=time.time,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires REAL, accessed REAL, latency REAL, value TEXT)"
+            )
+            self._disk.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """
+        Builds a cache from CHAT_CACHE_TTL (0 by default, which turns the cache off),
+        CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_DIR (enables the disk tier),
+        CHAT_CACHE_MAX_DISK_ENTRIES and CHAT_CACHE_TOOLS (comma separated fully qualified
+        names of tools whose results may be cached).
+        """
+        directory = os.getenv("CHAT_CACHE_DIR")
+        tools = os.getenv("CHAT_CACHE_TOOLS", "")
+        return cls(
+            ttl=float(os.getenv("CHAT_CACHE_TTL", "0")),
+            max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512")),
+            path=os.path.join(directory, "responses.sqlite3") if directory else None,
+            max_disk_entries=int(os.getenv("CHAT_CACHE_MAX_DISK_ENTRIES", "10000")),
+            cacheable_tools=frozenset(name.strip() for name in tools.split(",") if name.strip()),
+        )
+
+    def is_cacheable(self, chat_history: ChatHistory) -> bool:
+        """False when the history holds a tool result that is not allowed in the cache."""
+        for message in chat_history.messages:
+            for item in message.items:
+                if isinstance(item, FunctionResultContent) and item.name not in self.cacheable_tools:
+                    return False
+        return True
+
+    def bypass(self) -> None:
+        """Counts a request that was not eligible for the cache."""
+        self.bypassed += 1
+
+    def _disk_get(self, key: str, now: float):
+        with self._disk_lock:
+            row = self._disk.execute("SELECT expires, latency, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._disk.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._disk.commit()
+                return None
+            self._disk.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._disk.commit()
+            return row
+
+    def _disk_put(self, key: str, expires: float, latency: float, value: str, now: float) -> None:
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO responses (key, expires, accessed, latency, value) VALUES (?, ?, ?, ?, ?)",
+                (key, expires, now, latency, value),
+            )
+            self._disk.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            (count,) = self._disk.execute("SELECT count(*) FROM responses").fetchone()
+            if count > self.max_disk_entries:
+                self._disk.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_disk_entries,),
+                )
+                self.evictions += count - self.max_disk_entries
+            self._disk.commit()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> str | None:
+        """Returns the serialized response stored under ``key``, or None."""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                self.saved_seconds += entry[1]
+                return entry[2]
+            del self._entries[key]
+
+        if self._disk is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                self._remember(key, row)
+                self.disk_hits += 1
+                self.saved_seconds += row[1]
+                return row[2]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: str, latency: float) -> None:
+        """Stores a serialized response that took ``latency`` seconds to produce."""
+        if self.ttl <= 0:
+            return
+        now = self._clock()
+        expires = now + self.ttl
+        self._remember(key, (expires, latency, value))
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_put, key, expires, latency, value, now)
+
+    def clear(self) -> None:
+        """Drops every entry of both tiers."""
+        self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM responses")
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        """Returns the hit and miss counters and the model latency the hits saved."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+class CachedChatCompletion(ChatCompletionClientBase):
+    """
+    Answers from ``cache`` when it can and from ``inner`` otherwise. Function calling,
+    streaming and the execution settings are those of ``inner``.
+    """
+
+    SUPPORTS_FUNCTION_CALLING = True
+
+    inner: ChatCompletionClientBase
+    cache: ResponseCache
+
+    @classmethod
+    def wrap(cls, inner: ChatCompletionClientBase, cache: ResponseCache) -> "CachedChatCompletion":
+        return cls(
+            service_id=inner.service_id,
+            ai_model_id=inner.ai_model_id,
+            instruction_role=inner.instruction_role,
+            inner=inner,
+            cache=cache,
+        )
+
+    def get_prompt_execution_settings_class(self) -> type[PromptExecutionSettings]:
+        return self.inner.get_prompt_execution_settings_class()
+
+    def service_url(self) -> str | None:
+        return self.inner.service_url()
+
+    def _verify_function_choice_settings(self, settings: PromptExecutionSettings) -> None:
+        self.inner._verify_function_choice_settings(settings)
+
+    def _update_function_choice_settings_callback(self):
+        return self.inner._update_function_choice_settings_callback()
+
+    def _reset_function_choice_settings(self, settings: PromptExecutionSettings) -> None:
+        self.inner._reset_function_choice_settings(settings)
+
+    def _cache_key(self, chat_history: ChatHistory, settings: PromptExecutionSettings) -> str | None:
+        if getattr(settings, "number_of_responses", None) not in (None, 1):
+            return None
+        if not self.cache.is_cacheable(chat_history):
+            return None
+        request = {
+            "model": self.ai_model_id,
+            "messages": _normalize(self.inner._prepare_chat_history_for_request(chat_history)),
+            # Includes the tool definitions and tool_choice configured for this request
+            "settings": {
+                key: value
+                for key, value in settings.prepare_settings_dict().items()
+                if key not in _TRANSPORT_SETTINGS
+            },
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def _inner_get_chat_message_contents(
+        self, chat_history: ChatHistory, settings: PromptExecutionSettings
+    ) -> list[ChatMessageContent]:
+        key = self._cache_key(chat_history, settings)
+        if key is None:
+            self.cache.bypass()
+            return await self.inner._inner_get_chat_message_contents(chat_history, settings)
+
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return [ChatMessageContent.model_validate_json(cached)]
+
+        started = time.perf_counter()
+        messages = await self.inner._inner_get_chat_message_contents(chat_history, settings)
+        await self.cache.put(
+            key, messages[0].model_dump_json(exclude={"inner_content", "metadata"}), time.perf_counter() - started
+        )
+        return messages
+
+    async def _inner_get_streaming_chat_message_contents(
+        self, chat_history: ChatHistory, settings: PromptExecutionSettings, function_invoke_attempt: int = 0
+    ) -> AsyncGenerator[list[StreamingChatMessageContent], Any]:
+        key = self._cache_key(chat_history, settings)
+        if key is None:
+            self.cache.bypass()
+            async for chunks in self.inner._inner_get_streaming_chat_message_contents(
+                chat_history, settings, function_invoke_attempt
+            ):
+                yield chunks
+            return
+
+        cached = await self.cache.get(key)
+        if cached is not None:
+            message = ChatMessageContent.model_validate_json(cached)
+            yield [
+                StreamingChatMessageContent(
+                    role=message.role,
+                    name=message.name,
+                    choice_index=0,
+                    items=[
+                        StreamingTextContent(choice_index=0, text=item.text) if isinstance(item, TextContent) else item
+                        for item in message.items
+                    ],
+                    ai_model_id=message.ai_model_id,
+                    finish_reason=message.finish_reason,
+                    function_invoke_attempt=function_invoke_attempt,
+                )
+            ]
+            return
+
+        started = time.perf_counter()
+        full = None
+        async for chunks in self.inner._inner_get_streaming_chat_message_contents(
+            chat_history, settings, function_invoke_attempt
+        ):
+            for chunk in chunks:
+                if chunk.choice_index == 0:
+                    full = chunk if full is None else full + chunk
+            yield chunks
+
+        if full is not None:
+            message = ChatMessageContent(
+                role=full.role,
+                name=full.name,
+                items=[
+                    TextContent(text=item.text) if isinstance(item, StreamingTextContent) else item
+                    for item in full.items
+                    if not isinstance(item, StreamingTextContent) or item.text
+                ],
+                ai_model_id=full.ai_model_id,
+                finish_reason=full.finish_reason,
+            )
+            await self.cache.put(
+                key, message.model_dump_json(exclude={"inner_content", "metadata"}), time.perf_counter() - started
+            )
+
+
+_shared_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache shared by every wrapped chat service."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache.from_env()
+    return _shared_cache
@@ -0,0 +1,172 @@
+"""
+JSON encoding of PostgreSQL result rows for the agents.
+
+The encoder is built once per result set from ``cursor.description``: every column gets a
+converter chosen from its PostgreSQL type, so rows are converted and serialized in a
+single pass without inspecting each value's Python type. Two layouts are supported:
+
+    records   [{"customer_id": 123456, "card_blocked": true}, ...]
+    columnar  {"columns": ["customer_id", "card_blocked"], "rows": [[123456, true], ...]}
+
+The columnar layout repeats no column names, which keeps multi-row tool results short in
+the model context.
+"""
+import datetime
+import json
+from collections.abc import Iterator
+from decimal import Decimal
+from operator import methodcaller
+
+# PostgreSQL type OIDs (see pg_type) of the columns that need converting
+INT8_OID = 20
+NUMERIC_OID = 1700
+DATE_OID = 1082
+TIME_OID = 1083
+TIMETZ_OID = 1266
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+INTERVAL_OID = 1186
+UUID_OID = 2950
+
+INT4_MIN = -(2**31)
+INT4_MAX = 2**31 - 1
+
+LAYOUTS = ("records", "columnar")
+
+
+def _bigint(value):
+    # BIGINT identifiers such as credit_card_no are sent as strings so that no JSON
+    # consumer rounds them or renders them as amounts; small values stay numbers.
+    if INT4_MIN <= value <= INT4_MAX:
+        return value
+    return str(value)
+
+
+_isoformat = methodcaller("isoformat")
+
+_CONVERTERS = {
+    INT8_OID: _bigint,
+    NUMERIC_OID: str,
+    DATE_OID: _isoformat,
+    TIME_OID: _isoformat,
+    TIMETZ_OID: _isoformat,
+    TIMESTAMP_OID: _isoformat,
+    TIMESTAMPTZ_OID: _isoformat,
+    INTERVAL_OID: str,
+    UUID_OID: str,
+}
+
+
+def _convert_column(convert, column: tuple) -> list:
+    if None in column:
+        return [None if value is None else convert(value) for value in column]
+    return list(map(convert, column))
+
+
+def _default(value):
+    # Values of columns without a type code, e.g. rows built by hand
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+# Shared by every encoder, building a JSONEncoder costs more than encoding a small row
+_dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default).encode
+
+
+class ResultEncoder:
+    """Encodes the rows of one result set. Rows may be dicts (RealDictCursor) or tuples."""
+
+    def __init__(self, columns):
+        """
+        :param columns: ``cursor.description`` or a list of ``(name, type_code)`` pairs.
+        """
+        self.names = [column[0] for column in columns]
+        self._converters = [
+            (index, _CONVERTERS[column[1]]) for index, column in enumerate(columns) if column[1] in _CONVERTERS
+        ]
+        self._dumps = _dumps
+
+    def values(self, row) -> list:
+        """Returns the JSON-ready values of ``row`` in column order."""
+        values = list(row.values()) if isinstance(row, dict) else list(row)
+        for index, convert in self._converters:
+            value = values[index]
+            if value is not None:
+                values[index] = convert(value)
+        return values
+
+    def record(self, row) -> dict:
+        """Returns ``row`` as a JSON-ready dict."""
+        if not isinstance(row, dict):
+            return dict(zip(self.names, self.values(row)))
+        # Only the converted columns are touched, the other values are copied as they are
+        record = dict(row)
+        for index, convert in self._converters:
+            name = self.names[index]
+            value = record[name]
+            if value is not None:
+                record[name] = convert(value)
+        return record
+
+    def encode_row(self, row, layout: str = "records") -> str:
+        """Serializes one row for the given layout."""
+        if layout == "columnar":
+            return self._dumps(self.values(row))
+        return self._dumps(self.record(row))
+
+    def layout_rows(self, rows, layout: str = "records") -> list:
+        """
+        Returns ``rows`` as JSON-ready values for the given layout (value tuples or dicts),
+        converted column by column rather than row by row.
+        """
+        rows = [tuple(row.values()) for row in rows] if rows and isinstance(rows[0], dict) else rows
+        if rows and self._converters:
+            columns = list(zip(*rows))
+            for index, convert in self._converters:
+                columns[index] = _convert_column(convert, columns[index])
+            rows = zip(*columns)
+        if layout == "columnar":
+            return list(rows)
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+    def encode_rows(self, rows, layout: str = "records") -> Iterator[str]:
+        """
+        Serializes every row on its own, lazily, so a caller can stop at any row; the
+        results can be passed to :meth:`envelope`.
+        """
+        return map(self._dumps, self.layout_rows(rows, layout))
+
+    def encode_batch(self, rows, layout: str = "records") -> str:
+        """
+        Serializes ``rows`` with a single call to the C JSON encoder, as the comma separated
+        row documents :meth:`envelope` takes in place of a list of encoded rows.
+        """
+        return self._dumps(self.layout_rows(rows, layout))[1:-1]
+
+    def envelope(self, encoded_rows: list, layout: str = "records", **fields) -> str:
+        """
+        Assembles serialized rows (single rows or :meth:`encode_batch` chunks) and extra top
+        level ``fields`` into the final JSON document without serializing the rows a second
+        time.
+        """
+        parts = []
+        if layout == "columnar":
+            parts.append('"columns":' + self._dumps(self.names))
+        parts.append('"rows":[' + ",".join(encoded_rows) + "]")
+        for key, value in fields.items():
+            parts.append(self._dumps(key) + ":" + self._dumps(value))
+        return "{" + ",".join(parts) + "}"
+
+    def encode(self, rows, layout: str = "records", **fields) -> str:
+        """
+        Serializes ``rows`` and ``fields`` in one call, when no byte budget has to be
+        enforced.
+        """
+        document = {"columns": self.names} if layout == "columnar" else {}
+        document["rows"] = self.layout_rows(rows, layout)
+        document.update(fields)
+        return self._dumps(document)
@@ -0,0 +1,137 @@
+"""
+Process-wide registry of the objects that do not depend on the browser session.
+
+The chat completion service, its HTTP connection pool, the plugins (whose kernel
+functions are reflected once) and the kernels and agents built from them are created on
+first use and then shared by every Chainlit session. A session only keeps its own
+ChatHistory, so starting one costs a dictionary lookup instead of a client construction
+and a fresh TLS handshake.
+"""
+import os
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from semantic_kernel.functions import KernelPlugin
+
+from local_chat_completion import LocalChatCompletion
+from response_cache import CachedChatCompletion, get_response_cache
+from tracing import add_tracing_filter
+
+_http_client: httpx.AsyncClient | None = None
+_services: dict[str, ChatCompletionClientBase] = {}
+_plugins: dict[str, KernelPlugin] = {}
+_shared: dict[str, Any] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the HTTP client shared by every chat completion service. The pool size is read
+    from CHAT_HTTP_MAX_CONNECTIONS, CHAT_HTTP_MAX_KEEPALIVE and CHAT_HTTP_KEEPALIVE_EXPIRY.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("CHAT_HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("CHAT_HTTP_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("CHAT_HTTP_KEEPALIVE_EXPIRY", "60")),
+            )
+        )
+    return _http_client
+
+
+def get_chat_service(service_id: str = "agent", cacheable: bool = True) -> ChatCompletionClientBase:
+    """
+    Returns the chat service registered as ``service_id``, creating it on first use: an
+    AzureChatCompletion, or the rule-based LocalChatCompletion when CHAT_COMPLETION_BACKEND
+    is "local", behind the shared response cache when CHAT_CACHE_TTL is set.
+
+    :param service_id (str): registry key and service id of the service.
+    :param cacheable (bool): False for the kernels of selection and termination strategies,
+        whose prompts carry the rendered chat history and so customer data.
+    :return: the shared chat service.
+    :rtype: ChatCompletionClientBase
+    """
+    key = service_id if cacheable else f"{service_id}:uncached"
+    service = _services.get(key)
+    if service is None:
+        if os.getenv("CHAT_COMPLETION_BACKEND", "azure").lower() == "local":
+            service = LocalChatCompletion.from_env(service_id)
+        else:
+            service = AzureChatCompletion(
+                service_id=service_id,
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
+                endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            )
+            # Same endpoint, credentials and headers, but on the shared connection pool
+            service.client = service.client.with_options(http_client=get_http_client())
+        cache = get_response_cache()
+        if cacheable and cache.ttl > 0:
+            service = CachedChatCompletion.wrap(service, cache)
+        _services[key] = service
+    return service
+
+
+def get_plugin(plugin_name: str, factory: Callable[[], object]) -> KernelPlugin:
+    """Returns the plugin registered as ``plugin_name``, reflecting ``factory()`` on first use."""
+    plugin = _plugins.get(plugin_name)
+    if plugin is None:
+        plugin = KernelPlugin.from_object(plugin_name, factory())
+        _plugins[plugin_name] = plugin
+    return plugin
+
+
+def get_kernel(
+    name: str,
+    service_id: str = "agent",
+    plugins: dict[str, Callable[[], object]] | None = None,
+    configure: Callable[[Kernel], None] | None = None,
+) -> Kernel:
+    """
+    Returns the kernel registered as ``name``. On first use it is built with the shared chat
+    service, the shared plugins, the tracing filter and ``configure`` (e.g. to add filters), once.
+
+    :param name (str): registry key of the kernel.
+    :param service_id (str): chat service to add, see get_chat_service.
+    :param plugins (dict): plugin name to a factory of the plugin object, see get_plugin.
+    :param configure (callable): called with the new kernel before it is registered.
+    :return: the shared kernel.
+    :rtype: Kernel
+    """
+
+    def build() -> Kernel:
+        kernel = Kernel()
+        kernel.add_service(get_chat_service(service_id))
+        for plugin_name, factory in (plugins or {}).items():
+            kernel.add_plugin(get_plugin(plugin_name, factory))
+        add_tracing_filter(kernel)
+        if configure is not None:
+            configure(kernel)
+        return kernel
+
+    return shared(f"kernel:{name}", build)
+
+
+def shared(key: str, factory: Callable[[], Any]) -> Any:
+    """Returns the object registered as ``key``, creating it with ``factory()`` on first use."""
+    value = _shared.get(key)
+    if value is None:
+        value = _shared[key] = factory()
+    return value
+
+
+async def close() -> None:
+    """Closes the shared HTTP client and forgets every registered object."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _services.clear()
+    _plugins.clear()
+    _shared.clear()
@@ -0,0 +1,124 @@
+"""
+Non-blocking, structured logging for the Chainlit apps.
+
+setup_logging() replaces the root logger's handlers with a QueueHandler: a log call on the
+event loop only formats the message and appends the record to a queue, and a QueueListener
+thread does the console I/O. Records are written as one JSON object per line (CHAT_LOG_FORMAT=text for a
+human readable line) with the fields passed as ``extra``:
+
+    logger.info("query_database called", extra={"query_digest": digest, "query_chars": 120})
+
+Records logged with ``extra={"sampled": True}`` (per streamed chunk and similar) are kept
+only once every 1 / CHAT_LOG_SAMPLE_RATE records of the same message. The level comes from
+CHAT_LOG_LEVEL (INFO); message contents and SQL text are only logged at DEBUG.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from collections import defaultdict
+
+# Attributes every LogRecord has, anything else was passed as ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON: time, level, logger, message and the extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sampled":
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every ``1 / rate`` records marked ``sampled``, counted per message."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen: dict[str, int] = defaultdict(int)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False):
+            return True
+        if not self.every:
+            return False
+        count = self._seen[record.msg]
+        self._seen[record.msg] = count + 1
+        return count % self.every == 0
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that keeps the traceback out of the message. The base class folds it
+    into ``msg`` and clears ``exc_info`` and ``exc_text``, so JsonFormatter could not write
+    it as its own ``exception`` field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A copy, the other handlers of the record see it unchanged
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Formatted on the producer side, so the queue does not keep the frames alive
+            record.exc_text = record.exc_text or _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str | None = None, stream=None) -> None:
+    """
+    Routes the root logger through a queue to a background thread writing to ``stream``
+    (stderr), in place of its current handlers. Reads CHAT_LOG_LEVEL, CHAT_LOG_FORMAT and
+    CHAT_LOG_SAMPLE_RATE. Only the first call has an effect, so every app can call it at import.
+
+    :param level (str): log level, CHAT_LOG_LEVEL by default.
+    :param stream (file): where the records are written.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if os.getenv("CHAT_LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = StructuredQueueHandler(records)
+    handler.addFilter(SamplingFilter(float(os.getenv("CHAT_LOG_SAMPLE_RATE", "0.01"))))
+
+    root = logging.getLogger()
+    # Handlers already on the root (Chainlit's basicConfig writes to stdout) would still
+    # write on the event loop, the listener takes over
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel((level or os.getenv("CHAT_LOG_LEVEL", "INFO")).upper())
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Write out what is still queued when the process exits
+    atexit.register(_listener.stop)
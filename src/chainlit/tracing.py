@@ -0,0 +1,145 @@
+"""
+OpenTelemetry spans for the Chainlit apps.
+
+Tracing is off unless CHAT_TRACING is set, and then costs one ``is None`` check per span:
+``span`` hands out a shared no-op context and ``add_tracing_filter`` adds nothing. Set
+
+    CHAT_TRACING=file   to append one JSON span per line to CHAT_TRACING_FILE (traces.jsonl)
+    CHAT_TRACING=otlp   to export over OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (a local
+                        collector or Jaeger on http://localhost:4318 by default), which
+                        needs opentelemetry-exporter-otlp-proto-http
+
+Spans are exported in batches from a background thread. The provider is registered
+globally, so Semantic Kernel's own model call spans
+(SEMANTICKERNEL_EXPERIMENTAL_GENAI_ENABLE_OTEL_DIAGNOSTICS=true) end up in the same traces.
+
+    chainlit.on_message            traced()
+      group_chat.turn              traced_invoke(), one per agent turn
+        group_chat.selection       StateMachineSelectionStrategy
+        kernel.function            add_tracing_filter(), tools and strategy prompts
+          db.query                 DatabaseConnector and BlockedCardPlugin, SQL and row count
+        group_chat.termination     LayeredTerminationStrategy
+"""
+import atexit
+import functools
+import itertools
+import os
+from collections.abc import AsyncIterable
+from contextlib import nullcontext
+
+from opentelemetry import trace
+from semantic_kernel import Kernel
+from semantic_kernel.filters import FilterTypes
+
+_tracer: trace.Tracer | None = None
+# Handed out while tracing is off, set_attribute and friends do nothing on it
+_DISABLED = nullcontext(trace.INVALID_SPAN)
+
+
+def configure_tracing(mode: str | None = None, path: str | None = None) -> trace.Tracer | None:
+    """
+    Sets up the tracer provider and exporter for ``mode`` ("file", "otlp" or "" for off),
+    by default from CHAT_TRACING and CHAT_TRACING_FILE.
+
+    :param mode (str): exporter to use, tracing is turned off when empty.
+    :param path (str): file the "file" exporter appends to.
+    :return: the tracer, or None when tracing is off.
+    :rtype: Tracer
+    """
+    global _tracer
+    mode = (os.getenv("CHAT_TRACING", "") if mode is None else mode).lower()
+    if not mode or mode == "off":
+        _tracer = None
+        return None
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if mode == "file":
+        file = open(path or os.getenv("CHAT_TRACING_FILE", "traces.jsonl"), "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=file, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif mode == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError as e:
+            raise RuntimeError("CHAT_TRACING=otlp needs opentelemetry-exporter-otlp-proto-http installed.") from e
+        exporter = OTLPSpanExporter()
+    else:
+        raise ValueError(f"Unknown CHAT_TRACING '{mode}', expected 'file', 'otlp' or 'off'.")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "chainlit-agents")}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    # Flush the spans still queued when the process exits
+    atexit.register(provider.shutdown)
+    _tracer = provider.get_tracer(__name__)
+    return _tracer
+
+
+def span(name: str, attributes: dict | None = None):
+    """Starts ``name`` as the current span; use ``with span(...) as current`` to add attributes later."""
+    if _tracer is None:
+        return _DISABLED
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def traced(name: str):
+    """Decorates a coroutine function to run inside a span called ``name``."""
+
+    def decorate(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return await function(*args, **kwargs)
+            with _tracer.start_as_current_span(name):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+async def traced_invoke(group_chat) -> AsyncIterable:
+    """
+    ``group_chat.invoke()`` with a group_chat.turn span around each agent turn: the
+    selection, the agent's completion and tools, and the termination check of the message.
+    """
+    if _tracer is None:
+        async for message in group_chat.invoke():
+            yield message
+        return
+
+    messages = group_chat.invoke()
+    try:
+        for turn in itertools.count(1):
+            with _tracer.start_as_current_span("group_chat.turn", attributes={"group_chat.turn": turn}) as current:
+                try:
+                    message = await messages.__anext__()
+                except StopAsyncIteration:
+                    return
+                current.set_attribute("group_chat.agent", message.name or "")
+            yield message
+            if group_chat.is_complete:
+                return
+    finally:
+        await messages.aclose()
+
+
+def add_tracing_filter(kernel: Kernel) -> None:
+    """Adds a kernel.function span around every function ``kernel`` invokes, when tracing is on."""
+    if _tracer is None:
+        return
+
+    async def tracing_filter(context, next):
+        function = context.function
+        with _tracer.start_as_current_span(
+            "kernel.function",
+            attributes={"kernel.plugin": function.plugin_name or "", "kernel.function": function.name},
+        ):
+            await next(context)
+
+    kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, tracing_filter)
+
+
+configure_tracing()
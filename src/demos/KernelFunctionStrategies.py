@@ -10,8 +10,13 @@ from semantic_kernel.functions import KernelFunctionFromPrompt
 
 from dotenv import load_dotenv
 import os
+import sys
 load_dotenv()
 
+# Chat services come from the registry shared with the Chainlit apps (CHAT_COMPLETION_BACKEND=local runs offline)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from service_registry import get_chat_service
+
 """
 The following sample demonstrates how to create a simple, agent group chat that utilizes
 An Art Director Chat Completion Agent along with a Copy Writer Chat Completion Agent to
@@ -21,13 +26,9 @@ take a turn in the conversation.
 """
 
 
-def _create_kernel_with_chat_completion(service_id: str) -> Kernel:
+def _create_kernel_with_chat_completion(service_id: str, cacheable: bool = True) -> Kernel:
     kernel = Kernel()
-    kernel.add_service(AzureChatCompletion(service_id=service_id, 
-                                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                                        deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                                        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-                                        ))
+    kernel.add_service(get_chat_service(service_id, cacheable))
     return kernel
 
 
@@ -52,7 +53,8 @@ Consider suggestions when refining an idea.
 TASK = "a slogan for a new line of electric cars."
 
 
-async def main():
+def create_group_chat() -> AgentGroupChat:
+    """Builds the CopyWriter and ArtDirector group chat with its selection and termination functions."""
     # 1. Create the reviewer agent based on the chat completion service
     agent_reviewer = ChatCompletionAgent(
         kernel=_create_kernel_with_chat_completion("artdirector"),
@@ -106,19 +108,24 @@ async def main():
         termination_strategy=KernelFunctionTerminationStrategy(
             agents=[agent_reviewer],
             function=termination_function,
-            kernel=_create_kernel_with_chat_completion("termination"),
+            kernel=_create_kernel_with_chat_completion("termination", cacheable=False),
             result_parser=lambda result: str(result.value[0]).lower() == "yes",
             history_variable_name="history",
             maximum_iterations=10,
         ),
         selection_strategy=KernelFunctionSelectionStrategy(
             function=selection_function,
-            kernel=_create_kernel_with_chat_completion("selection"),
+            kernel=_create_kernel_with_chat_completion("selection", cacheable=False),
             result_parser=lambda result: str(result.value[0]) if result.value is not None else COPYWRITER_NAME,
             agent_variable_name="agents",
             history_variable_name="history",
         ),
     )
+    return chat
+
+
+async def main():
+    chat = create_group_chat()
 
     # 6. Add the task as a message to the group chat
     await chat.add_chat_message(message=TASK)
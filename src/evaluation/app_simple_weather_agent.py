@@ -7,9 +7,19 @@ from semantic_kernel.contents import ChatHistory, FunctionCallContent, FunctionR
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 
+import logging
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from service_registry import get_kernel, shared
+from stream_coalescer import StreamCoalescer
+from structured_logging import setup_logging
+from tracing import traced
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 # Example Native Plugin (Tool)
 class WeatherPlugin:
@@ -31,52 +41,45 @@ class WeatherPlugin:
 
 
 
-@cl.on_chat_start
-async def on_chat_start():
+AGENT_INSTRUCTIONS = """You are a helpful assistant that helps users with their queries.
+        You have access to a plugin that provides weather information for various cities.
+        Use the plugin to fetch weather details when the user asks about the weather in a specific city.
+        If the user asks for weather information, call the 'get_weather' function from the 'weather_plugin'.
+        If the user asks you to email them the weather information, politely inform them that you cannot send emails but please draft the email content for them.
+        If the user asks something unrelated to weather, respond politely that you can only help with weather-related queries.
+        """
+
+
+def _create_agent() -> ChatCompletionAgent:
     service_id = "agent"
-    
-    # Setup the brain (Core)
-    kernel = sk.Kernel()
-
-    # Add AI Chat Completion service
-    ai_service = AzureChatCompletion(service_id=service_id, 
-                                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                                        deployment_name=os.getenv("AZURE_OPENAI_CHAT_COMPLETION_MODEL"),
-                                        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-                                        )
-    kernel.add_service(ai_service)
-   
-    # Import the WeatherPlugin
-    kernel.add_plugin(WeatherPlugin(), plugin_name="weather_plugin")
+    # Setup the brain (Core), shared by every session
+    kernel = get_kernel(
+        "weather",
+        service_id=service_id,
+        plugins={"weather_plugin": WeatherPlugin},
+        # Captures function calls as Steps of whichever session invoked them
+        configure=lambda kernel: cl.SemanticKernelFilter(kernel=kernel),
+    )
     settings = kernel.get_prompt_execution_settings_from_service_id(service_id=service_id)
     settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
     # provide the agent a purpose, persona and situational awareness
-    agent = ChatCompletionAgent(
+    return ChatCompletionAgent(
         kernel=kernel,
         name="Host",
-        instructions="""You are a helpful assistant that helps users with their queries.
-        You have access to a plugin that provides weather information for various cities.
-        Use the plugin to fetch weather details when the user asks about the weather in a specific city.
-        If the user asks for weather information, call the 'get_weather' function from the 'weather_plugin'.
-        If the user asks you to email them the weather information, politely inform them that you cannot send emails but please draft the email content for them.
-        If the user asks something unrelated to weather, respond politely that you can only help with weather-related queries.
-        """,
+        instructions=AGENT_INSTRUCTIONS,
         arguments=KernelArguments(settings=settings),
     )
 
-    chat_history = ChatHistory()
-    
-    # Instantiate and add the Chainlit filter to the kernel
-    # This will automatically capture function calls as Steps
-    cl.SemanticKernelFilter(kernel=kernel)
 
-    cl.user_session.set("current_agent", agent)
-    cl.user_session.set("kernel", kernel)
-    cl.user_session.set("ai_service", ai_service)
-    cl.user_session.set("chat_history", chat_history)
+@cl.on_chat_start
+async def on_chat_start():
+    # Only the chat history belongs to the session
+    cl.user_session.set("current_agent", shared("agent:weather", _create_agent))
+    cl.user_session.set("chat_history", ChatHistory())
 
 @cl.on_message
+@traced("chainlit.on_message")
 async def on_message(message: cl.Message):
     #kernel = cl.user_session.get("kernel") # type: sk.Kernel
     #ai_service = cl.user_session.get("ai_service") # type: OpenAIChatCompletion
@@ -89,17 +92,13 @@ async def on_message(message: cl.Message):
     # Create a Chainlit message for the response stream
     answer = cl.Message(content="")
 
-    async for msg in agent.invoke_stream(messages=chat_history):
-        if str(msg.content.content):
-            await answer.stream_token(msg.content.content)
-        
-        print(f"# {msg.name}: ", end="")
-        if (
-            not any(isinstance(item, (FunctionCallContent, FunctionResultContent)) for item in msg.items)
-            and msg.content
-        ):
-            # We only want to print the content if it's not a function call or result
-            print(f"{msg.content}", end="", flush=True)
+    # Tokens go to the UI in batches (every 30 ms or 64 characters), not one event each
+    async with StreamCoalescer.from_env(answer) as stream:
+        async for msg in agent.invoke_stream(messages=chat_history):
+            if str(msg.content.content):
+                await stream.push(msg.content.content)
+    logger.info("agent message", extra={"agent": agent.name, "chars": len(answer.content)})
+    logger.debug("agent message content", extra={"agent": agent.name, "content": answer.content})
     # Add the full assistant response to history
     chat_history.add_assistant_message(answer.content)
 
@@ -0,0 +1,233 @@
+"""
+Parallel, resumable evaluation of agent runs, the evaluate() step of Evaluate_Azure_AI_Agent_Quality.ipynb.
+
+The rows of evaluation_data.jsonl (query, response, tool_definitions) are read one at a
+time and every (row, evaluator) judgment runs in a worker thread, --concurrency at a time,
+retried with exponential backoff when the call fails. Each judgment is stored in a SQLite
+cache under the hash of the row's content and the evaluator's version (its class, the
+azure-ai-evaluation version and the judge deployment, plus --evaluator-version to force a
+new round) as soon as it is made. The cache is the checkpoint: an interrupted run picks up
+where it stopped, and a rerun over a dataset that grew by 1% only judges the new 1%.
+
+Every judgment, cached or new, is appended to --out as one JSON line, and the run ends with
+the mean of every numeric result per evaluator.
+
+With --local-tool-calls, tool_call_accuracy is first scored by tool_call_scorer.py. The rows
+it fails (an undefined tool or invalid arguments) are recorded with the local verdict
+(version local/<scorer version>) without a judge call; the others still go to the LLM judge,
+since the scorer checks the calls against the schema but not whether they were the relevant
+ones.
+
+The judges need azure-ai-evaluation and AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY,
+AZURE_OPENAI_API_VERSION and MODEL_DEPLOYMENT_NAME, as in the notebook.
+
+USAGE:
+    python src/evaluation/run_evaluation.py src/evaluation/evaluation_data.jsonl --out evaluation_results.jsonl
+    python src/evaluation/run_evaluation.py data.jsonl --out results.jsonl --evaluators tool_call_accuracy --concurrency 16
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chainlit"))
+from structured_logging import setup_logging
+from tool_call_scorer import SCORER_VERSION, score_row
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Evaluator name to the azure.ai.evaluation class judging it
+EVALUATORS = {
+    "tool_call_accuracy": "ToolCallAccuracyEvaluator",
+    "intent_resolution": "IntentResolutionEvaluator",
+    "task_adherence": "TaskAdherenceEvaluator",
+}
+# The fields of a row the evaluators read, and so the ones its hash covers
+ROW_FIELDS = ("query", "response", "tool_definitions")
+
+
+def row_hash(row: dict) -> str:
+    """Hash of the evaluated content of ``row``, independent of key order and whitespace."""
+    content = json.dumps({field: row.get(field) for field in ROW_FIELDS}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def read_rows(path: str) -> Iterator[tuple[int, dict]]:
+    """Yields the line number and content of every row of the JSONL file ``path``, one at a time."""
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+class JudgmentCache:
+    """
+    Judgments by row hash, evaluator and evaluator version, in a SQLite file. Every
+    ``put`` is committed right away, so nothing judged is lost when a run is interrupted.
+    """
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS judgments ("
+            "row_hash TEXT, evaluator TEXT, version TEXT, result TEXT, created REAL, "
+            "PRIMARY KEY (row_hash, evaluator, version))"
+        )
+        self._db.commit()
+
+    def get(self, row_hash: str, evaluator: str, version: str) -> dict | None:
+        found = self._db.execute(
+            "SELECT result FROM judgments WHERE row_hash = ? AND evaluator = ? AND version = ?",
+            (row_hash, evaluator, version),
+        ).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def put(self, row_hash: str, evaluator: str, version: str, result: dict) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO judgments VALUES (?, ?, ?, ?, ?)",
+            (row_hash, evaluator, version, json.dumps(result), time.time()),
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def create_evaluators(names: list[str], salt: str = "") -> dict[str, tuple[Callable, str]]:
+    """
+    Builds the LLM-judged evaluators ``names`` against the judge deployment.
+
+    :param names (list): keys of EVALUATORS.
+    :param salt (str): added to every version, to judge everything again.
+    :return: evaluator name to the evaluator and its version.
+    :rtype: dict
+    """
+    try:
+        import azure.ai.evaluation as evaluation
+    except ImportError as e:
+        raise RuntimeError("The LLM-judged evaluators need azure-ai-evaluation installed.") from e
+
+    model_config = evaluation.AzureOpenAIModelConfiguration(
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        api_version=os.environ["AZURE_OPENAI_API_VERSION"],
+        azure_deployment=os.environ["MODEL_DEPLOYMENT_NAME"],
+    )
+    evaluators = {}
+    for name in names:
+        cls = getattr(evaluation, EVALUATORS[name])
+        version = f"{cls.__name__}/{evaluation.__version__}/{model_config['azure_deployment']}/{salt}"
+        evaluators[name] = (cls(model_config=model_config), version)
+    return evaluators
+
+
+async def judge(evaluator: Callable, row: dict, retries: int, backoff: float) -> dict:
+    """Runs the (blocking) ``evaluator`` on ``row`` in a worker thread, retrying failed calls."""
+    for attempt in range(retries + 1):
+        try:
+            return await asyncio.to_thread(evaluator, **{field: row[field] for field in ROW_FIELDS if field in row})
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2**attempt * random.uniform(0.5, 1.5)
+            logger.warning("evaluation failed, retrying", extra={"attempt": attempt + 1, "delay_s": round(delay, 2), "error": str(e)})
+            await asyncio.sleep(delay)
+
+
+async def run(args, evaluators: dict[str, tuple[Callable, str]]) -> dict:
+    cache = JudgmentCache(args.cache)
+    # Bounded, so a large dataset is read as fast as the workers consume it
+    pending: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    counts = {"rows": 0, "judgments": 0, "cached": 0, "evaluated": 0, "decided_locally": 0, "failed": 0}
+    scores: dict[str, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+    started = time.perf_counter()
+
+    async def produce():
+        for number, row in read_rows(args.data):
+            counts["rows"] += 1
+            digest = row_hash(row)
+            for name, (evaluator, version) in evaluators.items():
+                await pending.put((number, row, digest, name, evaluator, version))
+        for _ in range(args.concurrency):
+            await pending.put(None)
+
+    with open(args.out, "w", encoding="utf-8") as out:
+
+        def record(number: int, digest: str, name: str, version: str, result: dict, cached: bool) -> None:
+            out.write(json.dumps({"row": number, "row_hash": digest, "evaluator": name, "version": version, "cached": cached, "result": result}) + "\n")
+            counts["judgments"] += 1
+            for key, value in result.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    scores[name][key].append(value)
+
+        async def work():
+            while (job := await pending.get()) is not None:
+                number, row, digest, name, evaluator, version = job
+                if name == "tool_call_accuracy" and args.local_tool_calls:
+                    scored = score_row(row)
+                    # A local pass says nothing about relevance, only a failure is final
+                    if scored["verdict"] == "fail":
+                        counts["decided_locally"] += 1
+                        result = {"tool_call_local_verdict": scored["verdict"], "tool_call_local_score": scored["score"], "tool_call_local_flags": scored["flags"]}
+                        record(number, digest, name, f"local/{SCORER_VERSION}", result, cached=False)
+                        continue
+                result = cache.get(digest, name, version)
+                if result is not None:
+                    counts["cached"] += 1
+                    record(number, digest, name, version, result, cached=True)
+                    continue
+                try:
+                    result = await judge(evaluator, row, args.retries, args.backoff)
+                except Exception as e:
+                    counts["failed"] += 1
+                    logger.error("evaluation failed", extra={"row": number, "evaluator": name, "error": str(e)})
+                    continue
+                cache.put(digest, name, version, result)
+                counts["evaluated"] += 1
+                record(number, digest, name, version, result, cached=False)
+                if counts["evaluated"] % args.progress_every == 0:
+                    logger.info("progress", extra=counts)
+
+        await asyncio.gather(produce(), *(work() for _ in range(args.concurrency)))
+
+    cache.close()
+    return {
+        "data": args.data,
+        "out": args.out,
+        **counts,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "means": {name: {key: round(sum(values) / len(values), 4) for key, values in keys.items()} for name, keys in scores.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="JSONL of query, response and tool_definitions rows")
+    parser.add_argument("--out", required=True, help="JSONL file the judgments are written to")
+    parser.add_argument("--cache", default="evaluation_cache.sqlite3", help="SQLite file of the judgments, the checkpoint")
+    parser.add_argument("--evaluators", nargs="+", choices=EVALUATORS, default=list(EVALUATORS))
+    parser.add_argument("--evaluator-version", default="", help="added to every evaluator version, to judge everything again")
+    parser.add_argument("--local-tool-calls", action="store_true", help="record the rows tool_call_scorer.py fails without judging tool_call_accuracy")
+    parser.add_argument("--concurrency", type=int, default=8, help="judgments running at the same time")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=2.0, help="delay before the first retry (s), doubled each time")
+    parser.add_argument("--progress-every", type=int, default=100, help="log progress every N judgments")
+    args = parser.parse_args()
+    setup_logging()
+    evaluators = create_evaluators(args.evaluators, args.evaluator_version)
+    print(json.dumps(asyncio.run(run(args, evaluators))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Deterministic tool-call accuracy of agent runs, without an LLM judge.
+
+Every tool call in a row's response is checked against the row's tool_definitions: the
+tool must be defined, its arguments must validate against the JSON schema ``parameters``
+(validators are compiled once per distinct definition), and it gets flagged when it
+passes arguments the schema does not declare, repeats an earlier call with the same
+arguments, or has no tool result. The row's verdict is
+
+    fail        a call to an undefined tool or with invalid arguments
+    undecided   only soft flags (repeated or unanswered calls, undeclared arguments,
+                no tool call at all), or a tool definition without a name
+                (invalid_definition, the definition is skipped), left to
+                ToolCallAccuracyEvaluator
+    pass        every call is defined, valid, answered and made once
+
+A failed row needs no LLM judge (run_evaluation.py --local-tool-calls); a passed one is
+still judged, as the scorer does not check that the calls were the relevant ones.
+Rows are streamed; the per-row scores go to --out and the run prints one aggregate line
+per tool and a summary.
+
+USAGE:
+    python src/evaluation/tool_call_scorer.py src/evaluation/evaluation_data.jsonl
+    python src/evaluation/tool_call_scorer.py runs.jsonl --out tool_call_scores.jsonl
+"""
+import argparse
+import json
+import time
+from collections import Counter, defaultdict
+
+from jsonschema.validators import validator_for
+
+# Part of the version of the local judgments cached by run_evaluation.py
+SCORER_VERSION = "2"
+
+FAILING_FLAGS = {"unknown_tool", "invalid_arguments"}
+FLAGS = ("unknown_tool", "invalid_arguments", "unexpected_argument", "repeated_call", "missing_result", "error_result")
+
+_validators: dict[str, object] = {}
+
+
+def _validator(parameters: dict):
+    key = json.dumps(parameters, sort_keys=True)
+    validator = _validators.get(key)
+    if validator is None:
+        validator = _validators[key] = validator_for(parameters)(parameters)
+    return validator
+
+
+def _items(messages: list, item_type: str):
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict) and item.get("type") == item_type:
+                    yield message, item
+
+
+def score_row(row: dict) -> dict:
+    """
+    Checks the tool calls of ``row`` (query, response, tool_definitions).
+
+    :param row (dict): one row of evaluation_data.jsonl.
+    :return: verdict, score (share of calls without a flag), flags and one entry per call.
+    :rtype: dict
+    """
+    definitions, invalid_definitions = {}, 0
+    for definition in row.get("tool_definitions") or []:
+        name = definition.get("name") if isinstance(definition, dict) else None
+        if isinstance(name, str) and name:
+            definitions[name] = definition
+        else:
+            invalid_definitions += 1
+    response = row.get("response") or []
+    results = {message.get("tool_call_id"): item.get("tool_result") for message, item in _items(response, "tool_result")}
+
+    calls = []
+    seen = set()
+    for _, item in _items(response, "tool_call"):
+        name, arguments, flags = item.get("name"), item.get("arguments"), []
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = None
+        definition = definitions.get(name)
+        if definition is None:
+            flags.append("unknown_tool")
+        elif not isinstance(arguments, dict):
+            flags.append("invalid_arguments")
+        else:
+            parameters = definition.get("parameters") or {"type": "object"}
+            if next(_validator(parameters).iter_errors(arguments), None) is not None:
+                flags.append("invalid_arguments")
+            declared = parameters.get("properties")
+            if declared is not None and not arguments.keys() <= declared.keys():
+                flags.append("unexpected_argument")
+        signature = (name, json.dumps(arguments, sort_keys=True))
+        if signature in seen:
+            flags.append("repeated_call")
+        seen.add(signature)
+        call_id = item.get("tool_call_id")
+        if call_id not in results:
+            flags.append("missing_result")
+        elif isinstance(results[call_id], dict) and "error" in results[call_id]:
+            flags.append("error_result")
+        calls.append({"name": name, "flags": flags})
+
+    row_flags = {flag for call in calls for flag in call["flags"]}
+    if invalid_definitions:
+        row_flags.add("invalid_definition")
+    row_flags = sorted(row_flags)
+    if not calls:
+        verdict = "undecided" if definitions or invalid_definitions else "pass"
+    elif invalid_definitions:
+        # A call flagged unknown_tool may be to the tool whose definition has no name
+        verdict = "undecided"
+    elif FAILING_FLAGS.intersection(row_flags):
+        verdict = "fail"
+    elif row_flags:
+        verdict = "undecided"
+    else:
+        verdict = "pass"
+    return {
+        "verdict": verdict,
+        "score": round(sum(not call["flags"] for call in calls) / len(calls), 4) if calls else None,
+        "flags": row_flags,
+        "calls": calls,
+    }
+
+
+class ToolCallStats:
+    """Per-tool aggregates of scored rows: calls, flags and the share of calls without one."""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.clean: Counter = Counter()
+        self.flags: dict[str, Counter] = defaultdict(Counter)
+        self.verdicts: Counter = Counter()
+
+    def add(self, scored: dict) -> None:
+        self.verdicts[scored["verdict"]] += 1
+        for call in scored["calls"]:
+            name = call["name"] or ""
+            self.calls[name] += 1
+            self.clean[name] += not call["flags"]
+            for flag in call["flags"]:
+                self.flags[name][flag] += 1
+
+    def table(self) -> list[dict]:
+        return [
+            {
+                "tool": name,
+                "calls": calls,
+                **{flag: self.flags[name][flag] for flag in FLAGS},
+                "clean_rate": round(self.clean[name] / calls, 4),
+            }
+            for name, calls in self.calls.most_common()
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="JSONL of query, response and tool_definitions rows")
+    parser.add_argument("--out", help="JSONL file the per-row scores are written to")
+    args = parser.parse_args()
+
+    stats = ToolCallStats()
+    started = time.perf_counter()
+    rows = 0
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        with open(args.data, encoding="utf-8") as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                scored = score_row(json.loads(line))
+                stats.add(scored)
+                rows += 1
+                if out is not None:
+                    out.write(json.dumps({"row": number, **scored}) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    for entry in stats.table():
+        print(json.dumps(entry))
+    print(json.dumps({
+        "data": args.data,
+        "rows": rows,
+        **{verdict: stats.verdicts[verdict] for verdict in ("pass", "fail", "undecided")},
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_hour": round(rows * 3600 / elapsed) if elapsed else None,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "chainlit"))
+from database_connector import DatabaseConnector
+from query_cache import QueryCache
+
+
+class _Cursor:
+    def __init__(self, rows, description, rowcount):
+        self.rows = rows
+        self.description = description
+        self.rowcount = rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        if query.startswith("broken"):
+            raise RuntimeError("syntax error")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class _Connection:
+    def __init__(self, rows=(), description=None, rowcount=-1):
+        self.result = (list(rows), description, rowcount)
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(*self.result)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _Pool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def lease(self):
+        yield self.connection
+
+
+def _query(connection, query):
+    connector = DatabaseConnector(pool=_Pool(connection), cache=QueryCache())
+    return json.loads(asyncio.run(connector.query_database(query)))
+
+
+def test_statement_without_result_set_returns_rowcount():
+    assert _query(_Connection(rowcount=2), "update customerdata set first_name = 'a'") == {"rowcount": 2}
+
+
+def test_select_without_rows_returns_empty_result():
+    description = [("customer_id", 23)]
+    assert _query(_Connection(description=description, rowcount=0), "select customer_id from customerdata") == {"result_record": None}
+
+
+def test_select_returns_first_row():
+    description = [("customer_id", 23)]
+    result = _query(_Connection([{"customer_id": 3}], description, 1), "select customer_id from customerdata")
+    assert result == {"result_record": {"customer_id": 3}}
+
+
+def test_failing_statement_returns_error():
+    assert _query(_Connection(), "broken statement") == {"error": "syntax error"}
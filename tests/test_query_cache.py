@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "chainlit"))
+from query_cache import QueryCache, normalize_query, referenced_tables
+
+
+def test_comma_join_reads_every_table():
+    query = normalize_query("SELECT * FROM customerdata, credit_card_transactions")
+    assert referenced_tables(query) == {"customerdata", "credit_card_transactions"}
+
+
+def test_write_to_second_table_of_comma_join_invalidates():
+    cache = QueryCache()
+    query = normalize_query("select * from customerdata c, credit_card_transactions t where c.credit_card_no = t.credit_card_no")
+    cache.put(query, "rows")
+    assert cache.invalidate(referenced_tables(normalize_query("update credit_card_transactions set authentication_passed = true"))) == 1
+    assert cache.get(query) is None
+
+
+def test_comma_join_takes_shortest_table_ttl():
+    cache = QueryCache(table_ttls={"credit_card_transactions": 0})
+    query = normalize_query("select * from customerdata, credit_card_transactions")
+    cache.put(query, "rows")
+    assert cache.get(query) is None
+
+
+def test_cte_names_are_replaced_by_the_tables_of_their_bodies():
+    query = normalize_query("with x as (select * from credit_card_transactions) select * from x, customerdata")
+    assert referenced_tables(query) == {"credit_card_transactions", "customerdata"}
+
+
+def test_unresolved_relation_is_not_cached():
+    cache = QueryCache()
+    query = normalize_query("select * from generate_series(1, 3)")
+    assert referenced_tables(query) is None
+    cache.put(query, "rows")
+    assert cache.get(query) is None
+
+
+def test_double_quoted_identifiers_keep_their_case():
+    assert normalize_query('SELECT "Foo" FROM t') != normalize_query('SELECT "foo" FROM t')
+    assert normalize_query('SELECT "Foo"  FROM T') == normalize_query('select "Foo" from t')
+
+
+def test_quoted_identifier_with_a_quote_is_not_a_literal():
+    query = normalize_query('select "it\'s" from customerdata where name = \'a\'')
+    assert referenced_tables(query) == {"customerdata"}
+
+
+def test_time_dependent_queries_are_not_cached():
+    cache = QueryCache()
+    for function in ("now()", "current_date", "current_timestamp", "localtimestamp"):
+        query = normalize_query(
+            f"SELECT count(*) FROM credit_card_transactions WHERE authentication_passed = FALSE AND date >= {function} - interval '30 days'"
+        )
+        cache.put(query, "rows")
+        assert cache.get(query) is None, function